@@ -4,12 +4,49 @@ Student Data Export Tool
 Exports your team's sensor data from MongoDB for analysis
 """
 
+import asyncio
+import cProfile
 import json
 import csv
+import gzip
+import io
+import math
+import multiprocessing
+import os
+import pstats
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from pymongo import MongoClient
+import bson
+from bson import ObjectId
+from pymongo import MongoClient, monitoring
+from pymongo.errors import PyMongoError
 import sys
 
+# Optional: per-sensor statistics in the summary (pip install numpy)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Optional: only needed for Parquet/Arrow export (pip install pyarrow)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Optional: only needed for zstd compressed files (pip install zstandard)
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 # ============================================================================
 # CONFIGURATION - STUDENTS UPDATE THIS
 # ============================================================================
@@ -23,7 +60,11 @@ DATABASE_NAME = "workshop_team01"
 # Collection name (usually "sensor_data")
 COLLECTION_NAME = "sensor_data"
 
-# Export format: "json", "csv", or "both"
+# Export format: "json", "csv", "both", "parquet", "arrow" or "binary"
+#   "parquet" and "arrow" are typed, compressed column files that load
+#   much faster in Pandas (needs: pip install pyarrow)
+#   "binary" stores each sensor's readings as a sorted, memory-mappable
+#   array for fast time-range lookups (needs: pip install numpy)
 EXPORT_FORMAT = "both"
 
 # Export filename (without extension)
@@ -45,22 +86,405 @@ HOURS_TO_EXPORT = None
 #   MAX_DOCUMENTS = None      # Get all documents
 MAX_DOCUMENTS = None
 
+# Fields to export (set to None for all fields)
+# Only these fields are downloaded from the database. timestamp is always included.
+# Examples:
+#   EXPORT_FIELDS = ["temperature", "humidity"]
+#   EXPORT_FIELDS = None      # All fields
+EXPORT_FIELDS = None
+
+# Leave out the fields the bridge adds to every document
+# (timestamp_readable, team, topic) - they are the same in every row
+DROP_BRIDGE_FIELDS = False
+
+# ============================================================================
+# PERFORMANCE OPTIONS (Optional)
+# ============================================================================
+
+# Streaming export: documents flow from the database straight into the
+# export files in batches instead of being loaded into memory all at once.
+# Use this for big collections - memory use stays flat however much data there is.
+STREAM_EXPORT = False
+
+# Documents fetched and written per batch in streaming mode
+BATCH_SIZE = 1000
+
+# JSON layout in streaming mode:
+#   JSON_STYLE = "array"     # One JSON list, same as the normal export (.json)
+#   JSON_STYLE = "ndjson"    # One document per line (.ndjson)
+JSON_STYLE = "array"
+
+# Parallel fetch: split the timestamp range into slices and download them
+# on several threads at once (results still come out newest first).
+#   FETCH_WORKERS = 1         # Single cursor (default)
+#   FETCH_WORKERS = 8         # 8 concurrent cursors
+FETCH_WORKERS = 1
+
+# Number of time slices for parallel fetch (None = FETCH_WORKERS * 8)
+FETCH_PARTITIONS = None
+
+# Batches each parallel worker may fetch ahead of the writers.
+# Memory use is capped at about 2 * FETCH_WORKERS * PREFETCH_BATCHES * BATCH_SIZE
+# documents.
+PREFETCH_BATCHES = 4
+
+# Encode JSON/CSV batches on this many processes instead of one core.
+# Batches are encoded in parallel and written to the files in order.
+#   SERIALIZE_WORKERS = 1     # Encode in the main process (default)
+#   SERIALIZE_WORKERS = 8     # 8 encoder processes
+SERIALIZE_WORKERS = 1
+
+# Async export: fetching, summarizing and writing each file run as separate
+# stages joined by small queues, so the network, the CPU and the disk work
+# at the same time and JSON and CSV are written side by side from one fetch.
+# Batches come from the same fetch as the other exports, so RESAMPLE_UNIT,
+# USE_CACHE and FETCH_WORKERS apply here too.
+# PREFETCH_BATCHES sets how many batches each queue holds.
+ASYNC_EXPORT = False
+
+# Print a timing/throughput report at the end and save it to
+# OUTPUT_FILENAME.metrics.json (same as running: python data_export.py --metrics)
+SHOW_METRICS = False
+
+# Profile the serialization loops with cProfile (saved to OUTPUT_FILENAME.prof)
+PROFILE_SERIALIZATION = False
+
+# ============================================================================
+# COMPRESSION (Optional)
+# ============================================================================
+
+# Compress the export files while writing them:
+#   OUTPUT_COMPRESSION = None     # Plain files (default)
+#   OUTPUT_COMPRESSION = "gzip"   # .json.gz / .csv.gz (opens anywhere)
+#   OUTPUT_COMPRESSION = "zstd"   # .json.zst / .csv.zst (faster, needs: pip install zstandard)
+# Parquet and Arrow files are compressed inside the file instead and keep
+# their names (Parquet always uses zstd unless "gzip" is chosen).
+OUTPUT_COMPRESSION = None
+
+# JSON indentation: 2 is easy to read, None writes compact JSON (much smaller)
+JSON_INDENT = 2
+
+# Compress data sent over the network from MongoDB:
+#   WIRE_COMPRESSION = None       # No compression (default)
+#   WIRE_COMPRESSION = "zstd"     # Best ratio (needs: pip install "pymongo[zstd]")
+#   WIRE_COMPRESSION = "snappy"   # Fastest (needs: pip install "pymongo[snappy]")
+#   WIRE_COMPRESSION = "zlib"     # No extra packages needed
+WIRE_COMPRESSION = None
+
+# ============================================================================
+# ALL TEAMS EXPORT (Optional)
+# ============================================================================
+
+# Export every workshop_* database in one run over a single connection.
+# Uses the streaming export; files are named <database>_<collection>.*
+# (for example workshop_team01_sensor_data.csv). DATABASE_NAME and
+# OUTPUT_FILENAME are not used in this mode. Can't be combined with
+# INCREMENTAL_EXPORT (there is one checkpoint file, not one per team)
+# or PIVOT_EXPORT.
+EXPORT_ALL_TEAMS = False
+
+# How many team databases are exported at the same time
+TEAM_CONCURRENCY = 4
+
+# ============================================================================
+# RESAMPLING (Optional)
+# ============================================================================
+
+# Export time-bucket averages instead of every raw reading. The database
+# does the grouping, so only one row per bucket is downloaded.
+#   RESAMPLE_UNIT = None       # Raw readings (default)
+#   RESAMPLE_UNIT = "minute"   # One row per minute
+#   RESAMPLE_UNIT = "hour"     # One row per hour
+# Each numeric field gets _mean, _min, _max and _count columns.
+# Not used with INCREMENTAL_EXPORT.
+RESAMPLE_UNIT = None
+
+# Bucket size in RESAMPLE_UNIT units (e.g. 5 with "minute" = 5-minute buckets)
+RESAMPLE_BIN_SIZE = 1
+
+# Fields to resample (None = detect numeric fields from recent documents)
+#   RESAMPLE_FIELDS = ["temperature", "humidity"]
+RESAMPLE_FIELDS = None
+
+# Read from the minute / hour rollups that database_setup.py keeps next to
+# COLLECTION_NAME when their windows fit inside the buckets above. The
+# coarsest one that fits is used; readings newer than its last refresh (and
+# at the edges of HOURS_TO_EXPORT) still come from COLLECTION_NAME.
+USE_ROLLUPS = True
+
+# ============================================================================
+# PIVOT (Optional)
+# ============================================================================
+
+# Turn long-format readings (one document per sensor_name / sensor_value,
+# as sent by publishData() in the ESP32 sketch) into a wide table: one row
+# per time, one column per sensor. Rows are written oldest first.
+# Needs numpy (pip install numpy). Can't be combined with INCREMENTAL_EXPORT.
+PIVOT_EXPORT = False
+
+# How rows are lined up:
+#   PIVOT_INTERVAL_SECONDS = None   # One row per reading time (as-of join)
+#   PIVOT_INTERVAL_SECONDS = 1      # One row every second
+# Each cell holds the sensor's latest reading at or before the row time.
+PIVOT_INTERVAL_SECONDS = None
+
+# Oldest reading (in seconds) that may fill a cell (None = any age)
+PIVOT_TOLERANCE_SECONDS = 5
+
+# What to do with a cell that has no reading within the tolerance:
+#   PIVOT_FILL = None     # Leave it empty
+#   PIVOT_FILL = 0        # Use this value instead
+#   PIVOT_FILL = "drop"   # Leave out rows that have any empty cell
+PIVOT_FILL = None
+
+# ============================================================================
+# LOCAL CACHE (Optional)
+# ============================================================================
+
+# Keep a local copy of older data so repeat exports don't download it again.
+# Time is cut into buckets: finished buckets are read from the cache file and
+# only the newest, still-filling bucket is fetched from MongoDB.
+# Clear the cache for this database with: python data_export.py --invalidate-cache
+USE_CACHE = False
+
+# Cache file (SQLite database)
+CACHE_FILE = "export_cache.sqlite"
+
+# Size of one cached time bucket in hours
+CACHE_BUCKET_HOURS = 1
+
+# Maximum cache size - least recently used buckets are removed first
+CACHE_MAX_MB = 500
+
+# A bucket is only cached once it ended this many minutes ago (late data)
+CACHE_SETTLE_MINUTES = 10
+
+# ============================================================================
+# INCREMENTAL EXPORT (Optional)
+# ============================================================================
+
+# Incremental export: only fetch documents newer than the last run and
+# append them to the existing files. JSON is written as NDJSON (.ndjson)
+# so new documents can be appended. Good for hourly scheduled exports.
+# Needs EXPORT_FORMAT "json", "csv" or "both" - parquet/arrow/binary files
+# can't be appended to. Reads the raw readings in time order itself, so it
+# can't be combined with RESUMABLE_EXPORT, ASYNC_EXPORT, USE_CACHE,
+# FETCH_WORKERS > 1 or RESAMPLE_UNIT.
+INCREMENTAL_EXPORT = False
+
+# File that remembers the last exported document (None = OUTPUT_FILENAME.checkpoint.json)
+# Delete it to start again from the beginning.
+CHECKPOINT_FILE = None
+
+# ============================================================================
+# RESUMABLE EXPORT (Optional)
+# ============================================================================
+
+# Resumable export: fetch in pages of PAGE_SIZE documents, each page
+# starting after the last (timestamp, _id) written, instead of one long
+# cursor. A failed page is retried with a growing wait. After every page
+# the position is saved to a state file, so if the export is stopped (or
+# gives up) the next run carries on where it left off.
+# Works for uncompressed json/csv files; other formats only get the retries.
+# Reads the raw readings with its own paged query, so it can't be combined
+# with RESAMPLE_UNIT, USE_CACHE or FETCH_WORKERS > 1.
+RESUMABLE_EXPORT = False
+
+# Documents per page (each page is its own short query)
+PAGE_SIZE = 10000
+
+# How often a failed page is retried before giving up
+FETCH_RETRIES = 5
+
+# Wait before the first retry in seconds - doubles each time (max 60)
+RETRY_BACKOFF_SECONDS = 1
+
+# State file (None = OUTPUT_FILENAME.resume.json) - removed once the export finishes
+RESUME_STATE_FILE = None
+
 # ============================================================================
 # FUNCTIONS
 # ============================================================================
 
+# Fields added by the bridge rather than by the sensors
+METADATA_FIELDS = {"_id", "timestamp", "timestamp_readable", "team", "topic"}
+
+
+def metrics_enabled():
+    """Check if the metrics report was asked for (SHOW_METRICS or --metrics)"""
+    return SHOW_METRICS or "--metrics" in sys.argv
+
+
+class ExportMetrics:
+    """
+    Phase timings and counters for one export run
+
+    Phases are summed, so with several threads (parallel fetch, all teams)
+    a phase can add up to more than the wall-clock time.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.counters = {}
+        self.profiler = None
+        self.databases = None  # Set by the all-teams export
+
+    @contextmanager
+    def phase(self, name):
+        """Time a block of code and add it to the named phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0) + seconds
+
+    def add(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_output_file(self, filename):
+        """Count the size of a finished export file as bytes written"""
+        if os.path.exists(filename):
+            self.add("bytes_written", os.path.getsize(filename))
+
+    @contextmanager
+    def profile(self):
+        """Run a block under cProfile if PROFILE_SERIALIZATION is on"""
+        # cProfile follows one thread, so only the main thread is profiled
+        if (
+            self.profiler is None
+            or threading.current_thread() is not threading.main_thread()
+        ):
+            yield
+            return
+
+        self.profiler.enable()
+        try:
+            yield
+        finally:
+            self.profiler.disable()
+
+    def report(self):
+        """Return the metrics as a JSON-friendly dict"""
+        wall = time.perf_counter() - self.started
+        documents = self.counters.get("documents", 0)
+        return {
+            "databases": self.databases or [DATABASE_NAME],
+            "collection": COLLECTION_NAME,
+            "created": datetime.utcnow().isoformat() + "Z",
+            "wall_seconds": round(wall, 4),
+            "phases": {name: round(sec, 4) for name, sec in self.phases.items()},
+            "counters": dict(self.counters),
+            "docs_per_sec": round(documents / wall) if wall else None,
+            "peak_memory_mb": peak_memory_mb(),
+        }
+
+    def print_report(self):
+        report = self.report()
+        wall = report["wall_seconds"]
+
+        print(f"\n{'='*60}")
+        print("EXPORT METRICS")
+        print(f"{'='*60}")
+        print(f"{'Phase':<30} {'Seconds':>10} {'Share':>8}")
+        print("-" * 60)
+        for name, seconds in sorted(report["phases"].items(), key=lambda p: -p[1]):
+            share = seconds / wall * 100 if wall else 0
+            print(f"{name:<30} {seconds:>10.3f} {share:>7.1f}%")
+        print("-" * 60)
+        print(f"{'Total (wall clock)':<30} {wall:>10.3f}")
+
+        counters = report["counters"]
+        print()
+        print(f"Documents:          {counters.get('documents', 0)}")
+        print(f"Docs/sec:           {report['docs_per_sec']}")
+        if "bytes_received" in counters:
+            print(f"Bytes received:     {counters['bytes_received']:,} (BSON)")
+        print(f"Bytes written:      {counters.get('bytes_written', 0):,}")
+        print(f"Cursor batches:     {counters.get('cursor_batches', 0)}")
+        print(f"Server round-trips: {counters.get('server_round_trips', 0)}")
+        if report["peak_memory_mb"] is not None:
+            print(f"Peak memory:        {report['peak_memory_mb']:.1f} MB")
+
+    def save(self, filename):
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """
+    Counts server round-trips and cursor batches
+
+    Bytes received are counted where the batches are read instead (see
+    decode_raw_batches()), since the reply here is already decoded.
+    """
+
+    CURSOR_COMMANDS = {"find", "getMore", "aggregate"}
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        metrics.add("server_round_trips")
+        metrics.add_time("server_time", event.duration_micros / 1_000_000)
+        if event.command_name in self.CURSOR_COMMANDS:
+            metrics.add("cursor_batches")
+
+    def failed(self, event):
+        metrics.add("server_round_trips")
+        metrics.add("failed_commands")
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process in MB (None if unavailable)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+# Metrics for this run (always collected, only reported when enabled)
+metrics = ExportMetrics()
+
+
+def client_options():
+    """Options shared by the normal and the async MongoDB client"""
+    options = {"serverSelectionTimeoutMS": 5000}
+    if WIRE_COMPRESSION is not None:
+        options["compressors"] = WIRE_COMPRESSION
+    if metrics_enabled():
+        options["event_listeners"] = [CommandMetricsListener()]
+    return options
+
 
 def connect_to_database():
     """Connect to MongoDB and return collection"""
     try:
-        client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000)
+        client = MongoClient(MONGODB_URI, **client_options())
         client.admin.command("ping")
 
         db = client[DATABASE_NAME]
         collection = db[COLLECTION_NAME]
 
         print(f"✓ Connected to MongoDB")
-        print(f"  Database: {DATABASE_NAME}")
+        if WIRE_COMPRESSION is not None:
+            print(f"  Wire compression: {WIRE_COMPRESSION}")
+        if EXPORT_ALL_TEAMS:
+            print(f"  Database: all workshop_* databases")
+        else:
+            print(f"  Database: {DATABASE_NAME}")
         print(f"  Collection: {COLLECTION_NAME}")
 
         return client, collection
@@ -74,8 +498,14 @@ def connect_to_database():
         sys.exit(1)
 
 
-def build_query():
-    """Build MongoDB query based on filters"""
+def build_query(checkpoint=None):
+    """
+    Build MongoDB query based on filters
+
+    Args:
+        checkpoint: Checkpoint from load_checkpoint() - only documents
+            after the last exported one are matched
+    """
     query = {}
 
     # Add time range filter if specified
@@ -84,34 +514,1414 @@ def build_query():
         query["timestamp"] = {"$gte": cutoff_time}
         print(f"  Filtering: Last {HOURS_TO_EXPORT} hours")
 
+    # Only documents after the checkpoint (timestamp, then _id for ties)
+    if checkpoint is not None:
+        last_time = checkpoint["timestamp"]
+        query["$or"] = [
+            {"timestamp": {"$gt": last_time}},
+            {"timestamp": last_time, "_id": {"$gt": checkpoint["_id"]}},
+        ]
+        print(f"  Filtering: After {last_time.isoformat()}Z (last export)")
+
     return query
 
 
-def export_to_json(data, filename):
-    """Export data to JSON file"""
+def checkpoint_filename():
+    """Return the checkpoint filename for incremental exports"""
+    return CHECKPOINT_FILE or f"{OUTPUT_FILENAME}.checkpoint.json"
+
+
+def load_checkpoint():
+    """
+    Load the incremental export checkpoint
+
+    Returns:
+        dict: timestamp (datetime), _id and output file sizes, or None on
+            the first run
+    """
+    filename = checkpoint_filename()
+    if not os.path.exists(filename):
+        print(f"  No checkpoint found - exporting everything")
+        return None
+
+    with open(filename, "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+
+    checkpoint["timestamp"] = datetime.fromisoformat(checkpoint["timestamp"][:-1])
+    if ObjectId.is_valid(checkpoint["_id"]):
+        checkpoint["_id"] = ObjectId(checkpoint["_id"])
+
+    return checkpoint
+
+
+def save_checkpoint(last_doc, filenames):
+    """
+    Save the last exported document and the output file sizes
+
+    The file is replaced atomically so an interrupted run never leaves a
+    half-written checkpoint behind.
+    """
+    checkpoint = {
+        "database": DATABASE_NAME,
+        "collection": COLLECTION_NAME,
+        "timestamp": last_doc["timestamp"].isoformat() + "Z",
+        "_id": str(last_doc["_id"]),
+        "files": {
+            name: os.path.getsize(name) for name in filenames if os.path.exists(name)
+        },
+        "updated": datetime.utcnow().isoformat() + "Z",
+    }
+
+    filename = checkpoint_filename()
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(temp_filename, filename)
+
+
+def restore_output_files(checkpoint):
+    """
+    Cut output files back to their size at the last checkpoint
+
+    Rows written by a run that crashed before saving its checkpoint would
+    otherwise be exported twice.
+    """
+    for name, size in checkpoint.get("files", {}).items():
+        if not os.path.exists(name):
+            print(f"  ⚠ {name} is missing - delete {checkpoint_filename()}")
+            print("    to export everything again")
+            continue
+
+        if os.path.getsize(name) > size:
+            with open(name, "r+b") as f:
+                f.truncate(size)
+            print(f"  Removed unfinished rows from {name}")
+
+
+def resume_state_filename():
+    """Return the state filename for resumable exports"""
+    return RESUME_STATE_FILE or f"{OUTPUT_FILENAME}.resume.json"
+
+
+def resume_settings():
+    """Settings that must match for a resumed export to fit the earlier files"""
+    return {
+        "database": DATABASE_NAME,
+        "collection": COLLECTION_NAME,
+        "format": EXPORT_FORMAT,
+        "json_style": JSON_STYLE,
+        "fields": EXPORT_FIELDS,
+        "drop_bridge_fields": DROP_BRIDGE_FIELDS,
+        "hours": HOURS_TO_EXPORT,
+        "max_documents": MAX_DOCUMENTS,
+    }
+
+
+def load_resume_state():
+    """
+    Load the state left by an unfinished resumable export
+
+    Returns:
+        dict: Last written timestamp/_id, document count and writer
+            snapshots, or None to start from the beginning
+    """
+    filename = resume_state_filename()
+    if not os.path.exists(filename):
+        return None
+
+    with open(filename, "r", encoding="utf-8") as f:
+        state = json.load(f)
+
+    if state.get("settings") != resume_settings():
+        print(f"  ⚠ {filename} was made with different settings - starting over")
+        return None
+
+    state["timestamp"] = datetime.fromisoformat(state["timestamp"][:-1])
+    if ObjectId.is_valid(state["_id"]):
+        state["_id"] = ObjectId(state["_id"])
+
+    return state
+
+
+def save_resume_state(last_doc, count, writers):
+    """Save the position after a fully written page (atomic replace)"""
+    state = {
+        "settings": resume_settings(),
+        "timestamp": last_doc["timestamp"].isoformat() + "Z",
+        "_id": str(last_doc["_id"]),
+        "count": count,
+        "files": {writer.filename: writer.snapshot() for writer in writers},
+        "updated": datetime.utcnow().isoformat() + "Z",
+    }
+
+    filename = resume_state_filename()
+    temp_filename = filename + ".tmp"
+    with open(temp_filename, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_filename, filename)
+
+
+def build_projection():
+    """
+    Build the server-side projection for EXPORT_FIELDS / DROP_BRIDGE_FIELDS
+
+    Returns:
+        dict: Projection for find(), or None to fetch whole documents
+    """
+    if EXPORT_FIELDS:
+        projection = {field: 1 for field in EXPORT_FIELDS}
+        projection["timestamp"] = 1
+        # Incremental and resumable exports continue after the last _id
+        if "_id" not in projection and not (INCREMENTAL_EXPORT or RESUMABLE_EXPORT):
+            projection["_id"] = 0
+        return projection
+
+    if DROP_BRIDGE_FIELDS:
+        return {"timestamp_readable": 0, "team": 0, "topic": 0}
+
+    return None
+
+
+def decode_raw_batches(cursor, codec_options):
+    """
+    Decode the batches of a raw batch cursor, counting the bytes received
+
+    Each server batch is decoded in one call, like a normal cursor does,
+    so measuring the BSON size costs nothing extra.
+
+    Args:
+        cursor: Cursor from find_raw_batches() or aggregate_raw_batches()
+        codec_options: The collection's codec options
+    """
+    for raw_batch in cursor:
+        metrics.add("bytes_received", len(raw_batch))
+        batch = bson.decode_all(raw_batch, codec_options)
+        if batch:
+            yield batch
+
+
+def cursor_batches(collection, query, sort, limit=None):
+    """
+    Run a find() and yield the documents in batches
+
+    The projection from build_projection() is applied on the server, so
+    only the exported fields are sent and decoded. With metrics on, the
+    server batches are read raw so the bytes received can be counted.
+
+    Args:
+        collection: MongoDB collection
+        query: Filter for find()
+        sort: List of (field, direction) pairs
+        limit: Maximum number of documents (None = all)
+    """
+    if metrics_enabled():
+        cursor = collection.find_raw_batches(query, build_projection()).sort(sort)
+    else:
+        cursor = collection.find(query, build_projection()).sort(sort)
+    if limit is not None:
+        cursor = cursor.limit(limit)
+    cursor = cursor.batch_size(BATCH_SIZE)
+
+    if metrics_enabled():
+        yield from decode_raw_batches(cursor, collection.codec_options)
+    else:
+        yield from iter_batches(cursor, BATCH_SIZE)
+
+
+def keyset_batches(collection, query, after=None, skip_count=0, on_page=None):
+    """
+    Fetch documents newest first in pages, retrying failed pages
+
+    Each page is a separate query for the PAGE_SIZE documents that come
+    after the last (timestamp, _id) already yielded, so a dropped cursor
+    only costs the page it was reading. Failed pages are retried up to
+    FETCH_RETRIES times, waiting RETRY_BACKOFF_SECONDS, then twice as long.
+
+    Args:
+        collection: MongoDB collection
+        query: Filter from build_query()
+        after: (timestamp, _id) to continue after, or None to start at the newest
+        skip_count: Documents already exported (counts towards MAX_DOCUMENTS)
+        on_page: Called with (last_doc, total_count) once a page has been
+            written (the consumer asks for the next batch), and with
+            (None, total_count) when everything has been fetched
+    """
+    sort = [("timestamp", -1), ("_id", -1)]
+    count = skip_count
+    last_doc = None
+    page_count = 0
+
+    while MAX_DOCUMENTS is None or count < MAX_DOCUMENTS:
+        page_size = PAGE_SIZE
+        if MAX_DOCUMENTS is not None:
+            page_size = min(page_size, MAX_DOCUMENTS - count)
+
+        attempt = 0
+        while True:
+            page_query = query
+            if after is not None:
+                last_time, last_id = after
+                page_query = {
+                    "$and": [
+                        query,
+                        {
+                            "$or": [
+                                {"timestamp": {"$lt": last_time}},
+                                {"timestamp": last_time, "_id": {"$lt": last_id}},
+                            ]
+                        },
+                    ]
+                }
+
+            try:
+                for batch in cursor_batches(collection, page_query, sort, page_size):
+                    yield batch
+                    # The consumer has written the batch - move past it
+                    last_doc = batch[-1]
+                    after = (last_doc["timestamp"], last_doc["_id"])
+                    count += len(batch)
+                    page_count += len(batch)
+                    page_size -= len(batch)
+                break
+            except PyMongoError as e:
+                attempt += 1
+                if attempt > FETCH_RETRIES:
+                    raise
+                wait = min(RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1), 60)
+                print(
+                    f"\n  ⚠ Fetch failed ({e}) - retry {attempt}/{FETCH_RETRIES} in {wait}s"
+                )
+                metrics.add("fetch_retries")
+                time.sleep(wait)
+
+        if page_count == 0:
+            break
+
+        if on_page is not None:
+            on_page(last_doc, count)
+        page_count = 0
+
+        # A short page means the cursor ran out of documents
+        if page_size > 0:
+            break
+
+    if on_page is not None:
+        on_page(None, count)
+
+
+def find_time_range(collection, query):
+    """
+    Find the oldest and newest timestamp matching the query
+
+    Returns:
+        tuple: (oldest, newest) datetimes, or (None, None) if nothing matches
+    """
+    projection = {"timestamp": 1, "_id": 0}
+    oldest = collection.find_one(query, projection, sort=[("timestamp", 1)])
+    newest = collection.find_one(query, projection, sort=[("timestamp", -1)])
+
+    if not oldest or not newest:
+        return None, None
+
+    return oldest.get("timestamp"), newest.get("timestamp")
+
+
+def split_time_range(oldest, newest, partitions):
+    """
+    Split [oldest, newest] into half-open time slices, newest slice first
+
+    Returns:
+        list: (start, end) tuples covering the whole range
+    """
+    # BSON dates have millisecond precision, so end just past the newest one
+    end = newest + timedelta(milliseconds=1)
+    step = (end - oldest) / partitions
+
+    slices = []
+    for i in range(partitions):
+        start = oldest + step * i
+        stop = end if i == partitions - 1 else oldest + step * (i + 1)
+        if stop > start:
+            slices.append((start, stop))
+
+    slices.reverse()
+    return slices
+
+
+def parallel_fetch_batches(collection, query):
+    """
+    Fetch documents on FETCH_WORKERS threads, newest first
+
+    The timestamp range is cut into FETCH_PARTITIONS slices that are handed
+    out round-robin, so every worker is downloading at the same time. Each
+    slice gets its own bounded queue and the slices are read back in order,
+    which keeps the output sorted by timestamp without a merge buffer.
+    All workers share the MongoClient connection pool.
+
+    Documents without a timestamp are not included.
+    """
+    oldest, newest = find_time_range(collection, query)
+    if oldest is None:
+        return
+
+    partitions = FETCH_PARTITIONS or FETCH_WORKERS * 8
+    slices = split_time_range(oldest, newest, partitions)
+    workers = min(FETCH_WORKERS, len(slices))
+
+    print(f"  Parallel fetch: {workers} workers, {len(slices)} time slices")
+
+    queues = [queue.Queue(maxsize=PREFETCH_BATCHES) for _ in slices]
+    stop = threading.Event()
+    done = object()
+
+    def put(slice_queue, item):
+        # Wait for room, but give up if the reader has stopped
+        while not stop.is_set():
+            try:
+                slice_queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker(first_slice):
+        for index in range(first_slice, len(slices), workers):
+            start, end = slices[index]
+            slice_query = {"$and": [query, {"timestamp": {"$gte": start, "$lt": end}}]}
+
+            try:
+                batches = cursor_batches(collection, slice_query, [("timestamp", -1)])
+                for batch in batches:
+                    if not put(queues[index], batch):
+                        return
+            except Exception as e:
+                put(queues[index], e)
+                return
+
+            if not put(queues[index], done):
+                return
+
+    threads = [
+        threading.Thread(target=worker, args=(i,), daemon=True) for i in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    remaining = MAX_DOCUMENTS
     try:
-        # Convert datetime objects to ISO strings for JSON compatibility
-        json_data = []
-        for doc in data:
-            doc_copy = doc.copy()
+        for slice_queue in queues:
+            while True:
+                item = slice_queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+
+                if remaining is not None:
+                    item = item[:remaining]
+                    remaining -= len(item)
+
+                if item:
+                    yield item
+
+                if remaining == 0:
+                    return
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def is_numeric(value):
+    """Check if a value is a number or a string holding a number"""
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    if isinstance(value, str):
+        try:
+            float(value)
+            return True
+        except ValueError:
+            return False
+    return False
+
+
+def detect_numeric_fields(collection, query, sample_size=200):
+    """
+    Find the numeric sensor fields in the most recent documents
+
+    Returns:
+        tuple: (sorted field names, True if documents use sensor_name)
+    """
+    fields = set()
+    has_sensor_name = False
+
+    sample = collection.find(query).sort("timestamp", -1).limit(sample_size)
+    for doc in sample:
+        if "sensor_name" in doc:
+            has_sensor_name = True
+        for key, value in doc.items():
+            if key in METADATA_FIELDS or "." in key or key.startswith("$"):
+                continue
+            if is_numeric(value):
+                fields.add(key)
+
+    return sorted(fields), has_sensor_name
+
+
+def build_resample_pipeline(query, fields, group_by_sensor=False):
+    """
+    Build the aggregation pipeline for time-bucket resampling
+
+    Args:
+        query: Filter from build_query()
+        fields: Numeric fields to aggregate
+        group_by_sensor: Also group by sensor_name (one row per sensor per bucket)
+
+    Returns:
+        list: Aggregation pipeline stages
+    """
+    bucket = {
+        "$dateTrunc": {
+            "date": "$timestamp",
+            "unit": RESAMPLE_UNIT,
+            "binSize": RESAMPLE_BIN_SIZE,
+        }
+    }
+
+    group = {"_id": {"bucket": bucket}, "count": {"$sum": 1}}
+    project = {"_id": 0, "timestamp": "$_id.bucket"}
+    sort = {"timestamp": -1}
+
+    if group_by_sensor:
+        group["_id"]["sensor_name"] = "$sensor_name"
+        project["sensor_name"] = "$_id.sensor_name"
+        sort["sensor_name"] = 1
+
+    project["count"] = 1
+
+    for field in fields:
+        # Sensor values may be sent as strings - convert, skip anything else
+        value = {
+            "$convert": {
+                "input": f"${field}",
+                "to": "double",
+                "onError": None,
+                "onNull": None,
+            }
+        }
+        group[f"{field}_mean"] = {"$avg": value}
+        group[f"{field}_min"] = {"$min": value}
+        group[f"{field}_max"] = {"$max": value}
+        group[f"{field}_count"] = {"$sum": {"$cond": [{"$eq": [value, None]}, 0, 1]}}
+
+        for stat in ["mean", "min", "max", "count"]:
+            project[f"{field}_{stat}"] = 1
+
+    pipeline = [
+        {"$match": query},
+        {"$group": group},
+        {"$project": project},
+        {"$sort": sort},
+    ]
+
+    if MAX_DOCUMENTS is not None:
+        pipeline.append({"$limit": MAX_DOCUMENTS})
+
+    return pipeline
+
+
+# Rollup progress written by database_setup.py --refresh-rollups
+ROLLUP_STATE_COLLECTION = "rollup_state"
+
+# Length of the fixed-size RESAMPLE_UNIT values (the rest start on a day boundary)
+RESAMPLE_UNIT_SECONDS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def window_start(ts, seconds):
+    """Start of the window of the given length that ts falls in"""
+    epoch = datetime(1970, 1, 1)
+    return epoch + timedelta(
+        seconds=(ts - epoch) // timedelta(seconds=seconds) * seconds
+    )
+
+
+def choose_rollup(collection):
+    """
+    Find the coarsest rollup whose windows fit inside the resample buckets
+
+    Returns:
+        dict: The rollup's state document, or None to use raw readings
+    """
+    unit_seconds = RESAMPLE_UNIT_SECONDS.get(RESAMPLE_UNIT)
+    best = None
+
+    for state in collection.database[ROLLUP_STATE_COLLECTION].find():
+        if unit_seconds is not None:
+            fits = unit_seconds * RESAMPLE_BIN_SIZE % state["seconds"] == 0
+        else:
+            fits = 86400 % state["seconds"] == 0
+        if fits and (best is None or state["seconds"] > best["seconds"]):
+            best = state
+
+    return best
+
+
+def rollup_time_ranges(query, rollup):
+    """
+    Split the export range between the rollup and the raw readings
+
+    Returns:
+        tuple: (rollup time filter, raw time filter), or None if the
+            range is too short for any complete rollup window
+    """
+    seconds = rollup["seconds"]
+    # Windows before this won't change any more; newer ones may still be partial
+    complete = window_start(
+        rollup["watermark"] - timedelta(seconds=rollup["lateness_seconds"]), seconds
+    )
+
+    rollup_range = {"$lt": complete}
+    raw_ranges = [{"timestamp": {"$gte": complete}}]
+
+    cutoff = query.get("timestamp", {}).get("$gte")
+    if cutoff is not None:
+        # The window holding the cutoff is only partly wanted - use raw readings
+        first = window_start(cutoff, seconds)
+        if first < cutoff:
+            first += timedelta(seconds=seconds)
+            raw_ranges.append({"timestamp": {"$gte": cutoff, "$lt": first}})
+        if first >= complete:
+            return None
+        rollup_range["$gte"] = first
+
+    return rollup_range, {"$or": raw_ranges}
+
+
+def build_rollup_pipeline(query, fields, rollup, group_by_sensor=False):
+    """
+    Build the resample pipeline over a rollup collection
+
+    Rollup documents hold count, sum, min and max per field for one sensor
+    in one window. Raw readings outside the rollup's complete windows are
+    brought into the same shape with $unionWith, then everything is grouped
+    into RESAMPLE_UNIT buckets.
+
+    Returns:
+        list: Aggregation pipeline stages, or None if no rollup window fits
+    """
+    ranges = rollup_time_ranges(query, rollup)
+    if ranges is None:
+        return None
+    rollup_range, raw_range = ranges
+
+    raw_values = {}
+    for field in fields:
+        value = {
+            "$convert": {
+                "input": f"${field}",
+                "to": "double",
+                "onError": None,
+                "onNull": None,
+            }
+        }
+        raw_values[field] = {
+            "count": {"$cond": [{"$eq": [value, None]}, 0, 1]},
+            "sum": value,
+            "min": value,
+            "max": value,
+        }
+
+    raw_pipeline = [
+        {"$match": {"$and": [query, raw_range]}},
+        {
+            "$project": {
+                "_id": 0,
+                "timestamp": 1,
+                "sensor_name": 1,
+                "count": {"$literal": 1},
+                "values": raw_values,
+            }
+        },
+    ]
+
+    bucket = {
+        "$dateTrunc": {
+            "date": "$timestamp",
+            "unit": RESAMPLE_UNIT,
+            "binSize": RESAMPLE_BIN_SIZE,
+        }
+    }
+    group = {"_id": {"bucket": bucket}, "count": {"$sum": "$count"}}
+    project = {"_id": 0, "timestamp": "$_id.bucket"}
+    sort = {"timestamp": -1}
+
+    if group_by_sensor:
+        group["_id"]["sensor_name"] = "$sensor_name"
+        project["sensor_name"] = "$_id.sensor_name"
+        sort["sensor_name"] = 1
+
+    project["count"] = 1
+
+    for field in fields:
+        group[f"{field}_sum"] = {"$sum": f"$values.{field}.sum"}
+        group[f"{field}_count"] = {"$sum": f"$values.{field}.count"}
+        group[f"{field}_min"] = {"$min": f"$values.{field}.min"}
+        group[f"{field}_max"] = {"$max": f"$values.{field}.max"}
+
+        project[f"{field}_mean"] = {
+            "$cond": [
+                {"$gt": [f"${field}_count", 0]},
+                {"$divide": [f"${field}_sum", f"${field}_count"]},
+                None,
+            ]
+        }
+        for stat in ["min", "max", "count"]:
+            project[f"{field}_{stat}"] = 1
+
+    pipeline = [
+        {"$match": {"timestamp": rollup_range}},
+        {
+            "$project": {
+                "_id": 0,
+                "timestamp": 1,
+                "sensor_name": 1,
+                "count": 1,
+                "values": 1,
+            }
+        },
+        {"$unionWith": {"coll": COLLECTION_NAME, "pipeline": raw_pipeline}},
+        {"$group": group},
+        {"$project": project},
+        {"$sort": sort},
+    ]
+
+    if MAX_DOCUMENTS is not None:
+        pipeline.append({"$limit": MAX_DOCUMENTS})
+
+    return pipeline
+
+
+def resample_batches(collection, query):
+    """Yield time-bucket rows computed by the database, newest first"""
+    fields, has_sensor_name = detect_numeric_fields(collection, query)
+    if RESAMPLE_FIELDS is not None:
+        fields = list(RESAMPLE_FIELDS)
+
+    print(f"  Resampling: {RESAMPLE_BIN_SIZE} {RESAMPLE_UNIT} buckets")
+    print(f"  Fields: {', '.join(fields) if fields else '(none found)'}")
+    if MAX_DOCUMENTS is not None:
+        print(f"  Limiting to {MAX_DOCUMENTS} rows")
+
+    pipeline = None
+    source = collection
+    rollup = choose_rollup(collection) if USE_ROLLUPS else None
+    if rollup is not None:
+        pipeline = build_rollup_pipeline(query, fields, rollup, has_sensor_name)
+    if pipeline is not None:
+        source = collection.database[rollup["collection"]]
+        print(
+            f"  Reading from rollup {rollup['collection']} "
+            f"(refreshed {rollup['refreshed'].strftime('%Y-%m-%d %H:%M')} UTC)"
+        )
+    else:
+        pipeline = build_resample_pipeline(
+            query, fields, group_by_sensor=has_sensor_name
+        )
+
+    if metrics_enabled():
+        cursor = source.aggregate_raw_batches(
+            pipeline, allowDiskUse=True, batchSize=BATCH_SIZE
+        )
+        return decode_raw_batches(cursor, source.codec_options)
+
+    cursor = source.aggregate(pipeline, allowDiskUse=True, batchSize=BATCH_SIZE)
+    return iter_batches(cursor, BATCH_SIZE)
+
+
+class ChunkCache:
+    """
+    Local SQLite cache of documents, one row per closed time bucket
+
+    Rows are keyed by (database, collection, bucket hours, bucket start)
+    and hold the bucket's documents as concatenated BSON, newest first.
+    Buckets of different widths never match each other, so changing
+    CACHE_BUCKET_HOURS can't serve a wide bucket from a narrow one. The
+    total size is kept under max_bytes by dropping the least recently
+    used buckets.
+    """
+
+    def __init__(self, filename, max_bytes):
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(filename, timeout=30)
+
+        # Caches written before bucket_hours was part of the key can't be
+        # trusted with another bucket width - start over
+        columns = [
+            row[1] for row in self.connection.execute("PRAGMA table_info(chunks)")
+        ]
+        if columns and "bucket_hours" not in columns:
+            self.connection.execute("DROP TABLE chunks")
+
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                database TEXT,
+                collection TEXT,
+                bucket_hours REAL,
+                bucket_start TEXT,
+                doc_count INTEGER,
+                size INTEGER,
+                last_used REAL,
+                data BLOB,
+                PRIMARY KEY (database, collection, bucket_hours, bucket_start)
+            )
+            """)
+        self.connection.commit()
+        self.evict()  # CACHE_MAX_MB may have been lowered since the last run
+
+    def get(self, database, collection, bucket_hours, bucket_start):
+        """Return the cached documents of a bucket, or None if not cached"""
+        key = (database, collection, bucket_hours, bucket_start.isoformat())
+        row = self.connection.execute(
+            "SELECT data FROM chunks WHERE database = ? AND collection = ?"
+            " AND bucket_hours = ? AND bucket_start = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            return None
+
+        self.connection.execute(
+            "UPDATE chunks SET last_used = ? WHERE database = ?"
+            " AND collection = ? AND bucket_hours = ? AND bucket_start = ?",
+            (time.time(),) + key,
+        )
+        self.connection.commit()
+        return bson.decode_all(row[0])
+
+    def put(self, database, collection, bucket_hours, bucket_start, docs):
+        """Store the documents of a closed bucket"""
+        data = b"".join(bson.encode(doc) for doc in docs)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                database,
+                collection,
+                bucket_hours,
+                bucket_start.isoformat(),
+                len(docs),
+                len(data),
+                time.time(),
+                data,
+            ),
+        )
+        self.connection.commit()
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used buckets until the cache fits max_bytes"""
+        total = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM chunks"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
 
-            # Convert ObjectId to string
-            if "_id" in doc_copy:
-                doc_copy["_id"] = str(doc_copy["_id"])
+        rows = self.connection.execute(
+            "SELECT rowid, size FROM chunks ORDER BY last_used"
+        ).fetchall()
+        for rowid, size in rows:
+            if total <= self.max_bytes:
+                break
+            self.connection.execute("DELETE FROM chunks WHERE rowid = ?", (rowid,))
+            total -= size
+        self.connection.commit()
+
+    def invalidate(self, database=None, collection=None):
+        """
+        Delete cached buckets
+
+        Returns:
+            int: Number of buckets removed
+        """
+        conditions = []
+        params = []
+        if database is not None:
+            conditions.append("database = ?")
+            params.append(database)
+        if collection is not None:
+            conditions.append("collection = ?")
+            params.append(collection)
+
+        sql = "DELETE FROM chunks"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+
+        removed = self.connection.execute(sql, params).rowcount
+        self.connection.commit()
+        self.connection.execute("VACUUM")
+        return removed
+
+    def close(self):
+        self.connection.close()
+
+
+def apply_projection(doc, projection):
+    """Apply a find() projection to a cached document"""
+    if not projection:
+        return doc
+
+    if any(projection.values()):
+        keep = {key for key, value in projection.items() if value}
+        if projection.get("_id", 1):
+            keep.add("_id")
+        return {key: value for key, value in doc.items() if key in keep}
+
+    return {key: value for key, value in doc.items() if key not in projection}
+
+
+def cached_fetch_batches(collection, query):
+    """
+    Yield the export documents in batches, newest first, through ChunkCache
+
+    The matching time range is cut into CACHE_BUCKET_HOURS buckets. Closed
+    buckets come from the cache (and are added to it on a miss); the open
+    bucket is always read from MongoDB. Whole documents are cached, so the
+    projection is applied locally. Only the plain timestamp filter made by
+    build_query() is supported here.
+    """
+    oldest, newest = find_time_range(collection, query)
+    if oldest is None:
+        return
 
-            # Convert datetime objects to ISO strings
-            for key, value in doc_copy.items():
-                if isinstance(value, datetime):
-                    doc_copy[key] = value.isoformat() + "Z"
+    lower = query.get("timestamp", {}).get("$gte")
+    bucket_size = timedelta(hours=CACHE_BUCKET_HOURS)
+    settled_before = datetime.utcnow() - timedelta(minutes=CACHE_SETTLE_MINUTES)
+    projection = build_projection()
+    database = collection.database.name
+    remaining = MAX_DOCUMENTS
 
-            json_data.append(doc_copy)
+    # Buckets are aligned to whole multiples of the bucket size
+    epoch = datetime(1970, 1, 1)
+    bucket_start = epoch + ((newest - epoch) // bucket_size) * bucket_size
 
-        # Write to file
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(json_data, f, indent=2, ensure_ascii=False)
+    cache = ChunkCache(CACHE_FILE, CACHE_MAX_MB * 1024 * 1024)
+    hits = 0
+    misses = 0
+
+    try:
+        while bucket_start + bucket_size > oldest:
+            bucket_end = bucket_start + bucket_size
+            closed = bucket_end <= settled_before
+
+            docs = None
+            if closed:
+                docs = cache.get(
+                    database, collection.name, CACHE_BUCKET_HOURS, bucket_start
+                )
+            if docs is None:
+                bucket_query = {"timestamp": {"$gte": bucket_start, "$lt": bucket_end}}
+                docs = list(collection.find(bucket_query).sort("timestamp", -1))
+                if closed:
+                    cache.put(
+                        database,
+                        collection.name,
+                        CACHE_BUCKET_HOURS,
+                        bucket_start,
+                        docs,
+                    )
+                misses += 1
+            else:
+                hits += 1
+
+            if lower is not None:
+                docs = [doc for doc in docs if doc["timestamp"] >= lower]
+            if remaining is not None:
+                docs = docs[:remaining]
+                remaining -= len(docs)
+
+            for batch in iter_batches(docs, BATCH_SIZE):
+                yield [apply_projection(doc, projection) for doc in batch]
+
+            if remaining == 0:
+                break
+            bucket_start -= bucket_size
+    finally:
+        cache.close()
+        print(f"  Cache: {hits} buckets from disk, {misses} from MongoDB")
+
+
+def invalidate_cache():
+    """Delete the cached buckets of DATABASE_NAME / COLLECTION_NAME"""
+    if not os.path.exists(CACHE_FILE):
+        print(f"✓ No cache file found ({CACHE_FILE})")
+        return
+
+    cache = ChunkCache(CACHE_FILE, CACHE_MAX_MB * 1024 * 1024)
+    removed = cache.invalidate(DATABASE_NAME, COLLECTION_NAME)
+    cache.close()
+    print(f"✓ Removed {removed} cached buckets for {DATABASE_NAME}.{COLLECTION_NAME}")
+
+
+def fetch_batches(collection, query):
+    """
+    Yield the export documents in batches, newest first
+
+    Uses a single cursor, resample_batches() when RESAMPLE_UNIT is set,
+    cached_fetch_batches() when USE_CACHE is on, or parallel_fetch_batches()
+    when FETCH_WORKERS > 1.
+    """
+    if RESAMPLE_UNIT is not None:
+        return resample_batches(collection, query)
+
+    if USE_CACHE:
+        if MAX_DOCUMENTS is not None:
+            print(f"  Limiting to {MAX_DOCUMENTS} documents")
+        return cached_fetch_batches(collection, query)
+
+    if FETCH_WORKERS > 1:
+        if MAX_DOCUMENTS is not None:
+            print(f"  Limiting to {MAX_DOCUMENTS} documents")
+        return parallel_fetch_batches(collection, query)
+
+    # Apply limit if specified
+    if MAX_DOCUMENTS is not None:
+        print(f"  Limiting to {MAX_DOCUMENTS} documents")
+
+    return cursor_batches(collection, query, [("timestamp", -1)], MAX_DOCUMENTS)
+
+
+class SensorPivot:
+    """
+    Turns oldest-first long-format batches into wide rows
+
+    Each batch is aligned with NumPy: for every sensor, searchsorted finds
+    its latest reading at or before each row time (an as-of join). Only the
+    last reading of each sensor and the readings at the newest timestamp
+    (which may continue in the next batch) are carried over, so memory
+    stays bounded by the batch size.
+    """
+
+    def __init__(self, interval=None, tolerance=None, fill=None):
+        self.step = None if interval is None else int(interval * 1e9)
+        self.tolerance = None if tolerance is None else int(tolerance * 1e9)
+        self.fill = fill
+        self.sensors = []
+        self.sensor_index = {}
+        # Latest reading of each sensor: (epoch ns, value)
+        self.last = {}
+        self.next_row = None
+        self.pending = None
+
+    def _readings(self, batch):
+        """Return (epoch ns, sensor index, value) arrays for a batch"""
+        times = np.array(
+            [doc.get("timestamp") for doc in batch], dtype="datetime64[ns]"
+        ).astype(np.int64)
+        values = numeric_column(batch, "sensor_value")
+
+        names, inverse = np.unique(
+            np.array([str(doc.get("sensor_name")) for doc in batch]),
+            return_inverse=True,
+        )
+        for name in names.tolist():
+            if name not in self.sensor_index:
+                self.sensor_index[name] = len(self.sensors)
+                self.sensors.append(name)
+        codes = np.array([self.sensor_index[name] for name in names.tolist()])
+
+        keep = ~np.isnan(values)
+        return times[keep], codes[inverse][keep], values[keep]
+
+    def _row_times(self, times, end):
+        """Row times covered by these readings, up to (but not at) end"""
+        if self.step is None:
+            rows = np.unique(times)
+            return rows if end is None else rows[rows < end]
+
+        step = self.step
+        stop = int(times[-1]) + 1 if end is None else end
+        if self.next_row is None:
+            self.next_row = -(-int(times[0]) // step) * step
+        start, self.next_row = self.next_row, -(-stop // step) * step
+
+        if self.tolerance is None:
+            return np.arange(start, stop, step, dtype=np.int64)
+
+        # Only rows within the tolerance of some reading can have values,
+        # so long gaps between readings don't produce millions of empty rows
+        carried = np.array([time for time, _ in self.last.values()], dtype=np.int64)
+        begins = np.sort(np.concatenate([carried, times]))
+        ends = np.maximum.accumulate(begins + self.tolerance)
+        gap = begins[1:] > ends[:-1]
+        begins = begins[np.concatenate([[True], gap])]
+        ends = ends[np.concatenate([gap, [True]])]
+
+        ranges = [
+            np.arange(
+                max(-(-int(begin) // step) * step, start),
+                min(int(finish) + 1, stop),
+                step,
+                dtype=np.int64,
+            )
+            for begin, finish in zip(begins, ends)
+        ]
+        return np.concatenate(ranges) if ranges else np.array([], dtype=np.int64)
+
+    def _align(self, times, codes, values, end=None):
+        rows = self._row_times(times, end)
+        table = np.full((len(rows), len(self.sensors)), np.nan)
+
+        for index in range(len(self.sensors)):
+            mask = codes == index
+            sensor_times = times[mask]
+            sensor_values = values[mask]
+            if index in self.last:
+                last_time, last_value = self.last[index]
+                sensor_times = np.concatenate([[last_time], sensor_times])
+                sensor_values = np.concatenate([[last_value], sensor_values])
+            if not len(sensor_times):
+                continue
+
+            position = np.searchsorted(sensor_times, rows, side="right") - 1
+            found = position >= 0
+            position = np.maximum(position, 0)
+            if self.tolerance is not None:
+                found &= rows - sensor_times[position] <= self.tolerance
+            table[:, index] = np.where(found, sensor_values[position], np.nan)
+
+            self.last[index] = (sensor_times[-1], sensor_values[-1])
+
+        return rows, table
+
+    def _to_documents(self, rows, table):
+        if self.fill == "drop":
+            complete = ~np.isnan(table).any(axis=1)
+            rows, table = rows[complete], table[complete]
+        else:
+            # Fixed intervals can fall in gaps with no readings at all
+            has_data = ~np.isnan(table).all(axis=1)
+            rows, table = rows[has_data], table[has_data]
+            if self.fill is not None:
+                table = np.where(np.isnan(table), float(self.fill), table)
+
+        timestamps = rows.astype("datetime64[ns]").astype("datetime64[us]").tolist()
+        documents = []
+        for timestamp, values in zip(timestamps, table.tolist()):
+            doc = {"timestamp": timestamp}
+            for name, value in zip(self.sensors, values):
+                doc[name] = None if math.isnan(value) else value
+            documents.append(doc)
+        return documents
+
+    def update(self, batch):
+        """Add an oldest-first batch, returning the rows that are complete"""
+        if self.pending:
+            batch = self.pending + batch
+
+        # The newest timestamp may have more readings in the next batch
+        newest = batch[-1].get("timestamp")
+        split = len(batch)
+        while split and batch[split - 1].get("timestamp") == newest:
+            split -= 1
+        self.pending = batch[split:]
+        if not split:
+            return []
+
+        times, codes, values = self._readings(batch[:split])
+        end = int(np.datetime64(newest, "ns").astype(np.int64))
+        return self._to_documents(*self._align(times, codes, values, end))
+
+    def finish(self):
+        """Return the rows left after the last batch"""
+        batch, self.pending = self.pending, None
+        if not batch:
+            return []
+
+        times, codes, values = self._readings(batch)
+        if not len(times):
+            return []
+        return self._to_documents(*self._align(times, codes, values))
+
+
+def pivot_batches(collection, query):
+    """
+    Yield wide rows (timestamp + one column per sensor), oldest first
+
+    Readings are fetched oldest first with only the fields the pivot needs.
+    MAX_DOCUMENTS still means the newest readings.
+    """
+    pivot = SensorPivot(PIVOT_INTERVAL_SECONDS, PIVOT_TOLERANCE_SECONDS, PIVOT_FILL)
+
+    if PIVOT_INTERVAL_SECONDS is None:
+        print("  Pivot: one row per reading time")
+    else:
+        print(f"  Pivot: one row every {PIVOT_INTERVAL_SECONDS} seconds")
+    if PIVOT_TOLERANCE_SECONDS is not None:
+        print(f"  Tolerance: readings up to {PIVOT_TOLERANCE_SECONDS} seconds old")
+
+    if MAX_DOCUMENTS is not None:
+        print(f"  Limiting to the newest {MAX_DOCUMENTS} readings")
+        oldest = collection.find_one(
+            query,
+            {"timestamp": 1, "_id": 0},
+            sort=[("timestamp", -1)],
+            skip=MAX_DOCUMENTS - 1,
+        )
+        if oldest is not None:
+            query = {"$and": [query, {"timestamp": {"$gte": oldest["timestamp"]}}]}
+
+    projection = {"timestamp": 1, "sensor_name": 1, "sensor_value": 1, "_id": 0}
+    cursor = collection.find(query, projection).sort([("timestamp", 1)])
+    cursor = cursor.batch_size(BATCH_SIZE)
+
+    for batch in iter_batches(cursor, BATCH_SIZE):
+        with metrics.phase("pivot"):
+            rows = pivot.update(batch)
+        if rows:
+            yield rows
+
+    with metrics.phase("pivot"):
+        rows = pivot.finish()
+    if rows:
+        yield rows
+
+
+def iter_batches(documents, batch_size):
+    """Yield lists of up to batch_size documents from any iterable"""
+    batch = []
+    for doc in documents:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def json_default(value):
+    """Serialize the BSON values json can't handle (datetime, ObjectId, ...)"""
+    if isinstance(value, datetime):
+        return value.isoformat() + "Z"
+    return str(value)
+
+
+def csv_value(value):
+    """Convert a document value for a CSV cell"""
+    if isinstance(value, datetime):
+        return value.isoformat() + "Z"
+    return value
+
+
+def encode_json_batch(batch, style, indent, first):
+    """
+    Encode a batch for JsonStreamWriter (runs in encoder processes too)
+
+    Args:
+        batch: List of documents
+        style: "array" or "ndjson"
+        indent: Indent for "array" style (None = one compact document per line)
+        first: The batch starts the file (no separating comma)
+
+    Returns:
+        str: Text to append to the file
+    """
+    pad = "\n" + " " * (indent or 0)
+    chunks = []
+    for doc in batch:
+        if indent is None:
+            text = json.dumps(
+                doc,
+                separators=(",", ":"),
+                ensure_ascii=False,
+                default=json_default,
+            )
+        else:
+            text = json.dumps(
+                doc,
+                indent=indent,
+                ensure_ascii=False,
+                default=json_default,
+            )
+
+        if style == "ndjson":
+            chunks.append(text + "\n")
+        else:
+            separator = pad if first else "," + pad
+            chunks.append(separator + text.replace("\n", pad))
+        first = False
+
+    return "".join(chunks)
+
+
+def encode_csv_batch(batch, columns):
+    """Encode a batch as CSV rows for the given columns (runs in encoder processes too)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([[csv_value(doc.get(key)) for key in columns] for doc in batch])
+    return buffer.getvalue()
+
+
+serialization_pool = None
+serialization_pool_lock = threading.Lock()
+
+
+def get_serialization_pool():
+    """Return the shared encoder process pool, starting it on first use"""
+    global serialization_pool
+    with serialization_pool_lock:
+        if serialization_pool is None:
+            # The MongoClient already runs background threads, and forking
+            # a threaded process can copy a held lock into the child
+            serialization_pool = ProcessPoolExecutor(
+                max_workers=SERIALIZE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return serialization_pool
+
+
+def shutdown_serialization_pool():
+    """Stop the encoder processes (if they were started)"""
+    global serialization_pool
+    with serialization_pool_lock:
+        if serialization_pool is not None:
+            serialization_pool.shutdown(cancel_futures=True)
+            serialization_pool = None
+
+
+class OrderedEncoder:
+    """
+    Encodes batches on the process pool and writes them in order
+
+    Up to 2 * SERIALIZE_WORKERS batches per file are being encoded at once;
+    the oldest result is written as soon as it is ready, so the output is
+    the same as encoding one batch after another.
+    """
+
+    def __init__(self, write):
+        self.write = write
+        self.pending = deque()
+
+    def submit(self, encode, *args):
+        self.pending.append(get_serialization_pool().submit(encode, *args))
+        while len(self.pending) > 2 * SERIALIZE_WORKERS:
+            self._write_next()
+
+    def _write_next(self):
+        future = self.pending.popleft()
+        with metrics.phase("encode_wait"):
+            chunk = future.result()
+        self.write(chunk)
+
+    def flush(self):
+        while self.pending:
+            self._write_next()
+
+    def cancel(self):
+        for future in self.pending:
+            future.cancel()
+        self.pending.clear()
+
+
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+
+def compressed_filename(filename):
+    """Add the OUTPUT_COMPRESSION suffix (.gz / .zst) to a filename"""
+    return filename + COMPRESSION_SUFFIXES.get(OUTPUT_COMPRESSION, "")
+
+
+def compression_from_filename(filename):
+    """Return "gzip", "zstd" or None based on the file extension"""
+    for name, suffix in COMPRESSION_SUFFIXES.items():
+        if filename.endswith(suffix):
+            return name
+    return None
+
+
+def open_output(filename, mode="w", newline=None, compression="auto"):
+    """
+    Open an export file in text mode, compressed if its name says so
+
+    Args:
+        filename: File path (.gz = gzip, .zst = zstd, anything else = plain)
+        mode: "r", "w" or "a"
+        newline: Passed on to the text layer ("" for CSV files)
+        compression: "gzip", "zstd", None, or "auto" to go by the filename
+    """
+    if compression == "auto":
+        compression = compression_from_filename(filename)
+
+    if compression == "gzip":
+        return gzip.open(
+            filename, mode + "t", compresslevel=6, encoding="utf-8", newline=newline
+        )
 
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError(
+                "zstd compression needs zstandard - install it with: pip install zstandard"
+            )
+        return zstandard.open(filename, mode + "t", encoding="utf-8", newline=newline)
+
+    return open(filename, mode, encoding="utf-8", newline=newline)
+
+
+def uses_stream_writers():
+    """Check if the export goes through open_stream_writers() (JSON_STYLE applies)"""
+    streaming_modes = [
+        STREAM_EXPORT,
+        EXPORT_ALL_TEAMS,
+        RESUMABLE_EXPORT,
+        ASYNC_EXPORT,
+        PIVOT_EXPORT,
+    ]
+    return any(streaming_modes)
+
+
+def json_filename(output_filename=None):
+    """Return the JSON output filename for the current settings"""
+    output_filename = output_filename or OUTPUT_FILENAME
+    if INCREMENTAL_EXPORT or (uses_stream_writers() and JSON_STYLE == "ndjson"):
+        return compressed_filename(f"{output_filename}.ndjson")
+    return compressed_filename(f"{output_filename}.json")
+
+
+def csv_filename(output_filename=None):
+    """Return the CSV output filename for the current settings"""
+    return compressed_filename(f"{output_filename or OUTPUT_FILENAME}.csv")
+
+
+def export_to_json(data, filename):
+    """Export data to JSON file"""
+    try:
+        if SERIALIZE_WORKERS > 1:
+            # Same layout, encoded batch by batch on the process pool
+            writer = JsonStreamWriter(filename, indent=JSON_INDENT)
+            with metrics.phase("json_export"):
+                try:
+                    for batch in iter_batches(data, BATCH_SIZE):
+                        writer.write_batch(batch)
+                except Exception:
+                    writer.abort()
+                    raise
+            writer.close()
+            return
+
+        # Write to file (datetime and ObjectId values become strings)
+        with metrics.phase("json_export"), open_output(filename) as f:
+            json.dump(
+                data,
+                f,
+                indent=JSON_INDENT,
+                separators=(",", ":") if JSON_INDENT is None else None,
+                ensure_ascii=False,
+                default=json_default,
+            )
+
+        metrics.add_output_file(filename)
         print(f"✓ Exported to JSON: {filename}")
-        print(f"  Documents: {len(json_data)}")
+        print(f"  Documents: {len(data)}")
 
     except Exception as e:
         print(f"✗ JSON export failed: {e}")
@@ -136,26 +1946,27 @@ def export_to_csv(data, filename):
         fieldnames = sorted(list(fieldnames))
 
         # Write CSV
-        with open(filename, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+        with metrics.phase("csv_export"), open_output(filename, newline="") as f:
+            writer = csv.writer(f)
 
             # Write header
-            writer.writeheader()
-
-            # Write data rows
-            for doc in data:
-                # Convert datetime objects to strings
-                row = {}
-                for key, value in doc.items():
-                    if key == "_id":
-                        continue
-                    elif isinstance(value, datetime):
-                        row[key] = value.isoformat() + "Z"
-                    else:
-                        row[key] = value
-
-                writer.writerow(row)
-
+            writer.writerow(fieldnames)
+
+            # Write data rows (datetime objects converted to strings)
+            if SERIALIZE_WORKERS > 1:
+                encoder = OrderedEncoder(f.write)
+                try:
+                    for batch in iter_batches(data, BATCH_SIZE):
+                        encoder.submit(encode_csv_batch, batch, fieldnames)
+                    encoder.flush()
+                except Exception:
+                    encoder.cancel()
+                    raise
+            else:
+                for doc in data:
+                    writer.writerow([csv_value(doc.get(key)) for key in fieldnames])
+
+        metrics.add_output_file(filename)
         print(f"✓ Exported to CSV: {filename}")
         print(f"  Documents: {len(data)}")
         print(f"  Columns: {len(fieldnames)}")
@@ -164,92 +1975,1262 @@ def export_to_csv(data, filename):
         print(f"✗ CSV export failed: {e}")
 
 
-def print_summary(data):
-    """Print summary statistics about the data"""
-    if not data:
-        print("\n⚠ No data found!")
-        return
+class JsonStreamWriter:
+    """
+    Writes documents to a JSON file batch by batch
+
+    "array" style produces the same layout as export_to_json() (JSON_INDENT
+    spaces, or one compact document per line when None), "ndjson" writes
+    one compact document per line. The file is only created once
+    the first batch arrives. With append=True (NDJSON only) new documents
+    are added to the end of an existing file.
+    """
+
+    def __init__(self, filename, style="array", append=False, indent=2):
+        self.filename = filename
+        self.style = style
+        self.append = append and style == "ndjson"
+        self.indent = indent if style == "array" else None
+        self.count = 0
+        self.file = None
+        self.encoder = None
+
+    def _open(self, mode):
+        self.file = open_output(self.filename, mode)
+        if SERIALIZE_WORKERS > 1:
+            self.encoder = OrderedEncoder(self.file.write)
+
+    def write_batch(self, batch):
+        if self.file is None:
+            self._open("a" if self.append else "w")
+            if self.style == "array":
+                self.file.write("[")
+
+        first = self.count == 0
+        self.count += len(batch)
+
+        if self.encoder is not None:
+            self.encoder.submit(
+                encode_json_batch, batch, self.style, self.indent, first
+            )
+            return
 
-    print(f"\n{'='*60}")
-    print("DATA SUMMARY")
-    print(f"{'='*60}")
+        with metrics.phase("json_encode"):
+            text = encode_json_batch(batch, self.style, self.indent, first)
+
+        with metrics.phase("json_write"):
+            self.file.write(text)
+
+    def close(self):
+        if self.file is None:
+            return
+
+        if self.encoder is not None:
+            self.encoder.flush()
+            self.encoder = None
+
+        if self.style == "array":
+            self.file.write("\n]" if self.count else "]")
+        with metrics.phase("json_write"):
+            self.file.close()
+        self.file = None
+
+        metrics.add_output_file(self.filename)
+        print(f"✓ Exported to JSON: {self.filename}")
+        print(f"  Documents: {self.count}")
+
+    def snapshot(self):
+        """Flush and return what resume() needs to continue this file"""
+        if self.file is None:
+            return {"size": 0, "count": 0}
+        if self.encoder is not None:
+            self.encoder.flush()
+        self.file.flush()
+        return {"size": os.path.getsize(self.filename), "count": self.count}
+
+    def resume(self, snapshot):
+        """Continue a file after snapshot(), dropping anything written later"""
+        if not snapshot["count"] or not os.path.exists(self.filename):
+            return
+
+        with open(self.filename, "r+b") as f:
+            f.truncate(snapshot["size"])
+        self._open("a")
+        self.count = snapshot["count"]
+
+    def abort(self):
+        if self.encoder is not None:
+            self.encoder.cancel()
+            self.encoder = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class CsvStreamWriter:
+    """
+    Writes documents to a CSV file batch by batch
+
+    The header is taken from the fields of the first batch. If later
+    documents bring new fields, the file is rewritten once at the end
+    (streaming, row by row) with the full sorted header. With append=True
+    rows are added to an existing file using its header.
+    """
+
+    def __init__(self, filename, append=False):
+        self.filename = filename
+        self.append = append
+        self.count = 0
+        self.file = None
+        self.writer = None
+        self.encoder = None
+        self.columns = []
+        self.header_size = 0
+
+    def write_batch(self, batch):
+        if self.file is None and self.append:
+            self._open_for_append()
+
+        if self.file is None:
+            fieldnames = set()
+            for doc in batch:
+                fieldnames.update(doc.keys())
+            fieldnames.discard("_id")
+            self.columns = sorted(fieldnames)
+            self.header_size = len(self.columns)
+
+            self.file = open_output(self.filename, newline="")
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(self.columns)
+
+        if SERIALIZE_WORKERS > 1:
+            self._submit(batch)
+            return
+
+        with metrics.phase("csv_encode"):
+            known = set(self.columns)
+            known.add("_id")  # Not useful in CSV
+            rows = []
+            for doc in batch:
+                for key in doc:
+                    if key not in known:
+                        self.columns.append(key)
+                        known.add(key)
+
+                rows.append([csv_value(doc.get(key)) for key in self.columns])
+
+        with metrics.phase("csv_write"):
+            self.writer.writerows(rows)
+        self.count += len(batch)
+
+    def _submit(self, batch):
+        """Encode the batch on the process pool (SERIALIZE_WORKERS > 1)"""
+        if self.encoder is None:
+            self.encoder = OrderedEncoder(self.file.write)
+
+        # New fields are added to the columns here, so every encoder
+        # process gets the full column list for its batch
+        known = set(self.columns)
+        known.add("_id")  # Not useful in CSV
+        for doc in batch:
+            for key in doc:
+                if key not in known:
+                    self.columns.append(key)
+                    known.add(key)
+
+        self.encoder.submit(encode_csv_batch, batch, list(self.columns))
+        self.count += len(batch)
+
+    def close(self):
+        if self.file is None:
+            return
+
+        if self.encoder is not None:
+            self.encoder.flush()
+            self.encoder = None
+
+        with metrics.phase("csv_write"):
+            self.file.close()
+            self.file = None
+
+            if len(self.columns) > self.header_size:
+                self._rewrite_with_full_header()
+
+        metrics.add_output_file(self.filename)
+        print(f"✓ Exported to CSV: {self.filename}")
+        print(f"  Documents: {self.count}")
+        print(f"  Columns: {len(self.columns)}")
+
+    def snapshot(self):
+        """Flush and return what resume() needs to continue this file"""
+        if self.file is None:
+            return {"size": 0, "count": 0}
+        if self.encoder is not None:
+            self.encoder.flush()
+        self.file.flush()
+        return {
+            "size": os.path.getsize(self.filename),
+            "count": self.count,
+            "columns": self.columns,
+            "header_size": self.header_size,
+        }
+
+    def resume(self, snapshot):
+        """Continue a file after snapshot(), dropping anything written later"""
+        if not snapshot["count"] or not os.path.exists(self.filename):
+            return
+
+        with open(self.filename, "r+b") as f:
+            f.truncate(snapshot["size"])
+        self.file = open_output(self.filename, "a", newline="")
+        self.writer = csv.writer(self.file)
+        self.count = snapshot["count"]
+        self.columns = snapshot["columns"]
+        self.header_size = snapshot["header_size"]
+
+    def _open_for_append(self):
+        """Continue an existing CSV file, keeping its header"""
+        if not os.path.exists(self.filename) or os.path.getsize(self.filename) == 0:
+            return
+
+        with open_output(self.filename, "r", newline="") as f:
+            header = next(csv.reader(f), None)
+        if not header:
+            return
+
+        self.columns = header
+        self.header_size = len(header)
+        self.file = open_output(self.filename, "a", newline="")
+        self.writer = csv.writer(self.file)
+
+    def _rewrite_with_full_header(self):
+        """Rewrite the file so every row matches the final sorted header"""
+        fieldnames = sorted(self.columns)
+        temp_filename = self.filename + ".tmp"
+        compression = compression_from_filename(self.filename)
+
+        with open_output(self.filename, "r", newline="") as src, open_output(
+            temp_filename, "w", newline="", compression=compression
+        ) as dst:
+            reader = csv.reader(src)
+            writer = csv.DictWriter(dst, fieldnames=fieldnames)
+            writer.writeheader()
+
+            next(reader)  # Skip the partial header
+            for values in reader:
+                writer.writerow(dict(zip(self.columns, values)))
+
+        os.replace(temp_filename, self.filename)
+
+    def abort(self):
+        if self.encoder is not None:
+            self.encoder.cancel()
+            self.encoder = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def to_float(value):
+    """Convert a sensor value to float, or None if it is not a number"""
+    if isinstance(value, (bool, int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+class ColumnarStreamWriter:
+    """
+    Writes documents to a Parquet or Arrow IPC (Feather) file batch by batch
+
+    Column types are taken from the first batch: datetimes become
+    timestamp[ms] (datetime64 in Pandas), numbers and numeric strings
+    float64, team/topic/sensor_name dictionary-encoded strings (categories)
+    and anything else plain strings. Fields that only appear after the
+    first batch are skipped, as a column file has a fixed schema.
+    """
+
+    DICTIONARY_FIELDS = {"team", "topic", "sensor_name"}
+
+    # Rows per Parquet row group - small groups make files slower to read
+    ROW_GROUP_SIZE = 65536
+
+    def __init__(self, filename, file_format="parquet"):
+        if pa is None:
+            raise ImportError(
+                f"{file_format} export needs pyarrow - install it with: pip install pyarrow"
+            )
+
+        self.filename = filename
+        self.file_format = file_format
+        self.count = 0
+        self.schema = None
+        self.kinds = {}
+        self.dictionaries = {}
+        self.skipped_fields = set()
+        self.writer = None
+        self.pending = []
+        self.pending_rows = 0
+
+    def _kind(self, key, value):
+        if key == "_id":
+            return "string"
+        if key in self.DICTIONARY_FIELDS:
+            return "dictionary"
+        if isinstance(value, datetime):
+            return "timestamp"
+        if isinstance(value, bool):
+            return "bool"
+        if is_numeric(value):
+            return "float"
+        return "string"
+
+    def _create_schema(self, batch):
+        for doc in batch:
+            for key, value in doc.items():
+                if value is None:
+                    continue
+                kind = self._kind(key, value)
+                if self.kinds.setdefault(key, kind) != kind:
+                    self.kinds[key] = "string"  # Mixed types - keep as text
+
+        arrow_types = {
+            "timestamp": pa.timestamp("ms"),
+            "float": pa.float64(),
+            "bool": pa.bool_(),
+            "dictionary": pa.dictionary(pa.int32(), pa.string()),
+            "string": pa.string(),
+        }
+        self.schema = pa.schema(
+            [pa.field(key, arrow_types[self.kinds[key]]) for key in sorted(self.kinds)]
+        )
+
+        if self.file_format == "arrow":
+            # Arrow IPC only supports lz4/zstd; uncompressed files can be memory-mapped
+            compression = "zstd" if OUTPUT_COMPRESSION else None
+            options = pa.ipc.IpcWriteOptions(
+                compression=compression, emit_dictionary_deltas=True
+            )
+            self.writer = pa.ipc.new_file(self.filename, self.schema, options=options)
+        else:
+            compression = "gzip" if OUTPUT_COMPRESSION == "gzip" else "zstd"
+            self.writer = pq.ParquetWriter(
+                self.filename, self.schema, compression=compression
+            )
+
+    def _dictionary_column(self, key, values):
+        # One growing dictionary per column, so batches share their codes
+        lookup = self.dictionaries.setdefault(key, {})
+        indices = []
+        for value in values:
+            if value is None:
+                indices.append(None)
+                continue
+            value = str(value)
+            index = lookup.get(value)
+            if index is None:
+                index = lookup[value] = len(lookup)
+            indices.append(index)
+
+        return pa.DictionaryArray.from_arrays(
+            pa.array(indices, type=pa.int32()), pa.array(list(lookup), type=pa.string())
+        )
+
+    def _column(self, key, batch):
+        kind = self.kinds[key]
+        values = [doc.get(key) for doc in batch]
+
+        if kind == "timestamp":
+            values = [v if isinstance(v, datetime) else None for v in values]
+            return pa.array(values, type=pa.timestamp("ms"))
+        if kind == "float":
+            return pa.array([to_float(v) for v in values], type=pa.float64())
+        if kind == "bool":
+            values = [v if isinstance(v, bool) else None for v in values]
+            return pa.array(values, type=pa.bool_())
+        if kind == "dictionary":
+            return self._dictionary_column(key, values)
+        return pa.array(
+            [None if v is None else str(v) for v in values], type=pa.string()
+        )
+
+    def write_batch(self, batch):
+        if not batch:
+            return
+
+        if self.schema is None:
+            self._create_schema(batch)
 
-    # Count documents
-    print(f"Total documents: {len(data)}")
+        for doc in batch:
+            for key in doc:
+                if key not in self.kinds:
+                    self.skipped_fields.add(key)
 
-    # Get all unique fields
-    all_fields = set()
-    for doc in data:
-        all_fields.update(doc.keys())
+        with metrics.phase(f"{self.file_format}_encode"):
+            columns = [self._column(key, batch) for key in self.schema.names]
+            record_batch = pa.record_batch(columns, schema=self.schema)
+        self.count += len(batch)
 
-    all_fields.discard("_id")
-    all_fields.discard("timestamp")
-    all_fields.discard("timestamp_readable")
-    all_fields.discard("team")
-    all_fields.discard("topic")
+        if self.file_format == "arrow":
+            with metrics.phase("arrow_write"):
+                self.writer.write_batch(record_batch)
+            return
 
-    print(f"Sensor fields found: {', '.join(sorted(all_fields))}")
+        self.pending.append(record_batch)
+        self.pending_rows += len(batch)
+        if self.pending_rows >= self.ROW_GROUP_SIZE:
+            with metrics.phase("parquet_write"):
+                self._flush_row_group()
+
+    def _flush_row_group(self):
+        if self.pending:
+            self.writer.write_table(
+                pa.Table.from_batches(self.pending, schema=self.schema)
+            )
+        self.pending = []
+        self.pending_rows = 0
+
+    def close(self):
+        if self.writer is None:
+            return
 
-    # Time range
-    if data:
-        timestamps = [doc.get("timestamp") for doc in data if "timestamp" in doc]
-        timestamps = [ts for ts in timestamps if ts is not None]
+        with metrics.phase(f"{self.file_format}_write"):
+            if self.file_format == "parquet":
+                self._flush_row_group()
+            self.writer.close()
+        self.writer = None
+
+        metrics.add_output_file(self.filename)
+        print(f"✓ Exported to {self.file_format.capitalize()}: {self.filename}")
+        print(f"  Documents: {self.count}")
+        print(f"  Columns: {len(self.schema)}")
+        if self.skipped_fields:
+            print(f"  ⚠ Skipped late fields: {', '.join(sorted(self.skipped_fields))}")
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class BinaryStreamWriter:
+    """
+    Writes sensor readings to a memory-mappable binary file (.bin)
+
+    Each sensor gets one array of fixed-width records (int64 epoch-ns
+    timestamp, float64 value) sorted by time, plus a sparse index holding
+    every INDEX_EVERY-th timestamp. Open the file with BinaryExport.
+
+    Layout (little endian):
+        8 bytes   magic b"IOTBIN01"
+        8 bytes   uint64 header length (padded to 64 bytes)
+        header    JSON: dtypes, index spacing and, per sensor, the count
+                  and the record/index offsets (from the start of the file)
+        sections  records and index of each sensor, 64-byte aligned
+
+    Readings are spilled to one temporary file per sensor while exporting
+    and sorted at the end, one sensor at a time. Non-numeric readings and
+    documents without a timestamp are skipped.
+    """
+
+    MAGIC = b"IOTBIN01"
+    ALIGNMENT = 64
+    INDEX_EVERY = 1024
+
+    def __init__(self, filename):
+        if np is None:
+            raise ImportError(
+                "binary export needs numpy - install it with: pip install numpy"
+            )
+
+        self.filename = filename
+        self.record_dtype = np.dtype([("timestamp", "<i8"), ("value", "<f8")])
+        self.count = 0
+        self.parts = {}
+        self.skipped = 0
+
+    def _part_filename(self, index):
+        return f"{self.filename}.part{index}.tmp"
+
+    def write_batch(self, batch):
+        if not batch:
+            return
 
-        if timestamps:
-            oldest = min(timestamps)
-            newest = max(timestamps)
-            duration = newest - oldest
+        with metrics.phase("binary_encode"):
+            timestamps = [doc.get("timestamp") for doc in batch]
+            times = np.array(
+                [ts if isinstance(ts, datetime) else None for ts in timestamps],
+                dtype="datetime64[ns]",
+            ).astype(np.int64)
+            has_time = times != np.iinfo(np.int64).min  # NaT
+
+            fields = set()
+            for doc in batch:
+                fields.update(doc.keys())
+
+            written = 0
+            for name, rows, values in sensor_columns(batch, fields):
+                sensor_times = times if rows is None else times[rows]
+                keep = ~np.isnan(values) & (
+                    has_time if rows is None else has_time[rows]
+                )
+
+                records = np.empty(int(keep.sum()), dtype=self.record_dtype)
+                records["timestamp"] = sensor_times[keep]
+                records["value"] = values[keep]
+
+                if name not in self.parts:
+                    part = open(self._part_filename(len(self.parts)), "wb")
+                    self.parts[name] = [part, 0]
+                with metrics.phase("binary_write"):
+                    records.tofile(self.parts[name][0])
+                self.parts[name][1] += len(records)
+                written += len(records)
+
+        self.count += len(batch)
+        if not written:
+            self.skipped += len(batch)
+
+    def _align(self, f):
+        padding = -f.tell() % self.ALIGNMENT
+        f.write(b"\0" * padding)
+
+    def close(self):
+        if not self.parts:
+            return
+
+        with metrics.phase("binary_write"):
+            for part, _ in self.parts.values():
+                part.close()
+
+            # Work out where every section goes before writing the header
+            index_dtype = np.dtype("<i8")
+            sections = {}
+            relative = {}
+            offset = 0
+            for name, (_, count) in self.parts.items():
+                index_count = -(-count // self.INDEX_EVERY)
+                index_offset = offset + count * self.record_dtype.itemsize
+                sections[name] = {"count": count, "index_count": index_count}
+                relative[name] = (offset, index_offset)
+                offset = index_offset + index_count * index_dtype.itemsize
+                offset += -offset % self.ALIGNMENT
+
+            header = {
+                "format": "iot-sensor-binary",
+                "version": 1,
+                "record_dtype": self.record_dtype.descr,
+                "index_dtype": index_dtype.str,
+                "index_every": self.INDEX_EVERY,
+                "timestamp_unit": "ns",
+                "sensors": sections,
+            }
+
+            # Offsets in the header depend on the header's own length, so
+            # grow the data start until the header fits in front of it
+            data_start = 0
+            while True:
+                for name, section in sections.items():
+                    section["offset"] = relative[name][0] + data_start
+                    section["index_offset"] = relative[name][1] + data_start
+                header_bytes = json.dumps(header).encode("utf-8")
+                needed = 16 + len(header_bytes)
+                needed += -needed % self.ALIGNMENT
+                if needed <= data_start:
+                    break
+                data_start = needed
+            header_length = data_start - 16
+
+            with open(self.filename, "wb") as f:
+                f.write(self.MAGIC)
+                f.write(np.array(header_length, dtype="<u8").tobytes())
+                f.write(header_bytes.ljust(header_length, b" "))
+
+                for index, name in enumerate(self.parts):
+                    part_filename = self._part_filename(index)
+                    records = np.fromfile(part_filename, dtype=self.record_dtype)
+                    # Exports arrive newest first - a stable sort keeps the
+                    # order of readings with the same timestamp
+                    order = np.argsort(records["timestamp"][::-1], kind="stable")
+                    records = records[::-1][order]
+
+                    records.tofile(f)
+                    sparse_index = records["timestamp"][:: self.INDEX_EVERY]
+                    sparse_index.astype(index_dtype).tofile(f)
+                    self._align(f)
+                    os.remove(part_filename)
+
+        self.parts = {}
+
+        metrics.add_output_file(self.filename)
+        print(f"✓ Exported to binary: {self.filename}")
+        print(f"  Documents: {self.count}")
+        print(f"  Sensors: {', '.join(sections)}")
+        if self.skipped:
+            print(f"  ⚠ Skipped {self.skipped} documents without numeric readings")
+
+    def abort(self):
+        for index, (part, _) in enumerate(self.parts.values()):
+            part.close()
+            if os.path.exists(self._part_filename(index)):
+                os.remove(self._part_filename(index))
+        self.parts = {}
+
+
+class BinaryExport:
+    """
+    Reads a .bin file from BinaryStreamWriter without loading it
+
+    Every sensor's records are a read-only np.memmap, so slicing a time
+    window only touches the pages it needs and copies nothing:
+
+        data = BinaryExport("team01_sensor_data.bin")
+        hour = data.window("dht_sensor", "2025-01-15T10:00", "2025-01-15T11:00")
+        hour["value"].mean()
+        hour["timestamp"].view("datetime64[ns]")
+    """
+
+    def __init__(self, filename):
+        if np is None:
+            raise ImportError("reading binary exports needs numpy (pip install numpy)")
+
+        self.filename = filename
+        with open(filename, "rb") as f:
+            if f.read(8) != BinaryStreamWriter.MAGIC:
+                raise ValueError(f"{filename} is not a binary sensor export")
+            header_length = int(np.frombuffer(f.read(8), dtype="<u8")[0])
+            self.header = json.loads(f.read(header_length))
+
+        self.record_dtype = np.dtype(
+            [tuple(field) for field in self.header["record_dtype"]]
+        )
+        self.index_every = self.header["index_every"]
+        self.sensors = list(self.header["sensors"])
+
+    def records(self, sensor):
+        """All records of one sensor, oldest first (np.memmap, read-only)"""
+        section = self.header["sensors"][sensor]
+        if not section["count"]:
+            return np.empty(0, dtype=self.record_dtype)
+        return np.memmap(
+            self.filename,
+            dtype=self.record_dtype,
+            mode="r",
+            offset=section["offset"],
+            shape=(section["count"],),
+        )
+
+    def index(self, sensor):
+        """Every index_every-th timestamp of one sensor (np.memmap)"""
+        section = self.header["sensors"][sensor]
+        if not section["index_count"]:
+            return np.empty(0, dtype=self.header["index_dtype"])
+        return np.memmap(
+            self.filename,
+            dtype=self.header["index_dtype"],
+            mode="r",
+            offset=section["index_offset"],
+            shape=(section["index_count"],),
+        )
+
+    @staticmethod
+    def _epoch_ns(value):
+        if isinstance(value, (int, np.integer)):
+            return int(value)
+        return int(np.datetime64(value, "ns").astype(np.int64))
+
+    def _position(self, records, index, time, side):
+        # The sparse index narrows the search to one block of records
+        block = max(int(np.searchsorted(index, time, side=side)) - 1, 0)
+        start = block * self.index_every
+        stop = min(start + self.index_every + 1, len(records))
+        return start + int(
+            np.searchsorted(records["timestamp"][start:stop], time, side=side)
+        )
+
+    def window(self, sensor, start=None, end=None):
+        """
+        Records with start <= timestamp < end, as a view into the file
+
+        Args:
+            sensor: Sensor name (see .sensors)
+            start: datetime, ISO string, np.datetime64 or epoch ns (None = first)
+            end: Same types as start, not included (None = last)
+        """
+        records = self.records(sensor)
+        index = self.index(sensor)
+        first = (
+            0
+            if start is None
+            else self._position(records, index, self._epoch_ns(start), "left")
+        )
+        last = (
+            len(records)
+            if end is None
+            else self._position(records, index, self._epoch_ns(end), "left")
+        )
+        return records[first : max(first, last)]
+
+
+def export_to_columnar(data, filename, file_format):
+    """Export data to a Parquet or Arrow file"""
+    try:
+        if not data:
+            print(f"✗ No data to export to {file_format}")
+            return
+
+        writer = ColumnarStreamWriter(filename, file_format)
+        try:
+            for batch in iter_batches(data, BATCH_SIZE):
+                writer.write_batch(batch)
+        except Exception:
+            writer.abort()
+            raise
+        writer.close()
+
+    except Exception as e:
+        print(f"✗ {file_format.capitalize()} export failed: {e}")
+
+
+def export_to_binary(data, filename):
+    """Export data to a memory-mappable binary file (see BinaryExport)"""
+    try:
+        if not data:
+            print("✗ No data to export to binary")
+            return
+
+        writer = BinaryStreamWriter(filename)
+        try:
+            for batch in iter_batches(data, BATCH_SIZE):
+                writer.write_batch(batch)
+        except Exception:
+            writer.abort()
+            raise
+        writer.close()
+
+    except Exception as e:
+        print(f"✗ Binary export failed: {e}")
+
+
+def open_stream_writers(append=False, output_filename=None):
+    """
+    Create the streaming writers for EXPORT_FORMAT
+
+    Args:
+        append: Add to existing files (incremental export)
+        output_filename: Filename without extension (default OUTPUT_FILENAME)
+    """
+    output_filename = output_filename or OUTPUT_FILENAME
+    writers = []
+
+    if EXPORT_FORMAT in ["json", "both"]:
+        style = "ndjson" if append else JSON_STYLE
+        filename = json_filename(output_filename)
+        writers.append(
+            JsonStreamWriter(filename, style=style, append=append, indent=JSON_INDENT)
+        )
+
+    if EXPORT_FORMAT in ["csv", "both"]:
+        writers.append(CsvStreamWriter(csv_filename(output_filename), append=append))
+
+    if EXPORT_FORMAT in ["parquet", "arrow"]:
+        if append:
+            print(f"  ⚠ {EXPORT_FORMAT} files can't be appended to - use json or csv")
+        else:
+            filename = f"{output_filename}.{EXPORT_FORMAT}"
+            writers.append(ColumnarStreamWriter(filename, EXPORT_FORMAT))
+
+    if EXPORT_FORMAT == "binary":
+        if append:
+            print("  ⚠ binary files can't be appended to - use json or csv")
+        else:
+            writers.append(BinaryStreamWriter(f"{output_filename}.bin"))
+
+    return writers
+
+
+def numeric_column(batch, field):
+    """
+    Pull one field out of a batch as a float64 array (NaN for non-numbers)
+
+    NumPy parses numbers, numeric strings and None in one go; the slow
+    per-value path is only used when a batch holds other values.
+    """
+    values = [doc.get(field) for doc in batch]
+    try:
+        column = np.array(values, dtype=np.float64)
+        if column.ndim == 1:
+            return column
+    except (TypeError, ValueError):
+        pass
+
+    floats = (to_float(value) for value in values)
+    return np.array(
+        [math.nan if value is None else value for value in floats],
+        dtype=np.float64,
+    )
+
+
+def sensor_columns(batch, fields):
+    """
+    Split a batch into one float64 column per sensor
+
+    Every numeric non-metadata field is a sensor. Long-format documents
+    (sensor_name / sensor_value) are split by sensor_name.
+
+    Args:
+        batch: List of documents
+        fields: Field names found in the batch
+
+    Yields:
+        tuple: (sensor name, rows, values) - rows is a boolean mask of the
+            batch documents the values came from (None = all of them);
+            values are NaN where a reading is not a number
+    """
+    long_format = "sensor_name" in fields and "sensor_value" in fields
+
+    for field in sorted(fields - METADATA_FIELDS - {"sensor_name"}):
+        if long_format and field == "sensor_value":
+            continue
+        yield field, None, numeric_column(batch, field)
+
+    if long_format:
+        names = np.array([str(doc.get("sensor_name")) for doc in batch])
+        values = numeric_column(batch, "sensor_value")
+        for name in np.unique(names).tolist():
+            rows = names == name
+            yield name, rows, values[rows]
+
+
+class ExactStats:
+    """Keeps every value of a field so percentiles are exact (in-memory export)"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def update(self, values):
+        self.chunks.append(values)
+
+    def result(self):
+        values = np.concatenate(self.chunks)
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {
+            "count": len(values),
+            "min": values.min(),
+            "max": values.max(),
+            "mean": values.mean(),
+            "std": values.std(),
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
+        }
+
+
+class RunningStats:
+    """
+    Constant-memory statistics for a field (streaming export)
+
+    Mean and standard deviation use Welford's method, merged one batch at a
+    time. Percentiles come from a log-bucket sketch (as in DDSketch): each
+    value is counted in a bucket whose bounds are 1% apart, so a percentile
+    is within 1% of the true value whatever the number of readings.
+    """
+
+    RELATIVE_ACCURACY = 0.01
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.gamma = (1 + self.RELATIVE_ACCURACY) / (1 - self.RELATIVE_ACCURACY)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+
+    def update(self, values):
+        n = len(values)
+        batch_mean = values.mean()
+        batch_m2 = ((values - batch_mean) ** 2).sum()
+
+        # Chan et al. merge of two Welford states
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += batch_m2 + delta * delta * self.count * n / total
+        self.count = total
+
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+        self.zeros += int((values == 0).sum())
+        self._add_to_sketch(self.positive, values[values > 0])
+        self._add_to_sketch(self.negative, -values[values < 0])
+
+    def _add_to_sketch(self, buckets, values):
+        if not len(values):
+            return
+        keys = np.ceil(np.log(values) / self.log_gamma).astype(np.int64)
+        unique, counts = np.unique(keys, return_counts=True)
+        for key, count in zip(unique.tolist(), counts.tolist()):
+            buckets[key] = buckets.get(key, 0) + count
+
+    def _bucket_value(self, key):
+        return 2 * self.gamma**key / (self.gamma + 1)
+
+    def quantile(self, q):
+        rank = q * (self.count - 1)
+        seen = 0
+
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._bucket_value(key)
+
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._bucket_value(key)
+
+        return self.max
+
+    def result(self):
+        # Sketch values are clamped so they never fall outside the real range
+        def clamp(value):
+            return min(max(value, self.min), self.max)
+
+        return {
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "std": math.sqrt(self.m2 / self.count),
+            "p50": clamp(self.quantile(0.50)),
+            "p95": clamp(self.quantile(0.95)),
+            "p99": clamp(self.quantile(0.99)),
+        }
+
+
+class SensorStatistics:
+    """
+    Per-sensor count/min/max/mean/std/percentiles, one batch at a time
+
+    Every numeric non-metadata field gets its own statistics. Long-format
+    documents (sensor_name / sensor_value) are grouped by sensor_name.
+    With exact=True all values are kept for exact percentiles, otherwise
+    RunningStats keeps memory constant.
+    """
+
+    def __init__(self, exact=False):
+        self.stats_class = ExactStats if exact else RunningStats
+        self.stats = {}
+
+    def _add(self, name, values):
+        values = values[~np.isnan(values)]
+        if len(values):
+            if name not in self.stats:
+                self.stats[name] = self.stats_class()
+            self.stats[name].update(values)
+
+    def update(self, batch, fields):
+        for name, rows, values in sensor_columns(batch, fields):
+            self._add(name, values)
+
+    def print_report(self):
+        if not self.stats:
+            return
+
+        print(f"\nSensor statistics:")
+        print(
+            f"  {'Sensor':<18} {'Count':>9} {'Min':>9} {'Max':>9} {'Mean':>9} "
+            f"{'Std':>9} {'p50':>9} {'p95':>9} {'p99':>9}"
+        )
+        for name in sorted(self.stats):
+            result = self.stats[name].result()
+            numbers = " ".join(
+                f"{result[key]:>9.4g}"
+                for key in ["min", "max", "mean", "std", "p50", "p95", "p99"]
+            )
+            print(f"  {name[:18]:<18} {result['count']:>9} {numbers}")
+
+
+class SummaryCollector:
+    """
+    Gathers the print_summary statistics one batch at a time
+
+    Only the field names, the time range, the first document and the
+    sensor statistics are kept, so it works the same for a list of
+    documents or a streaming export.
+    """
+
+    def __init__(self, exact_stats=False):
+        self.count = 0
+        self.fields = set()
+        self.oldest = None
+        self.newest = None
+        self.sample = None
+        self.last = None
+        self.sensor_stats = SensorStatistics(exact_stats) if np is not None else None
+
+    def update(self, batch):
+        batch_fields = set()
+        for doc in batch:
+            if self.sample is None:
+                self.sample = doc
+
+            self.count += 1
+            batch_fields.update(doc.keys())
+
+            ts = doc.get("timestamp")
+            if ts is not None:
+                if self.oldest is None or ts < self.oldest:
+                    self.oldest = ts
+                if self.newest is None or ts > self.newest:
+                    self.newest = ts
+
+        self.fields |= batch_fields
+        if batch:
+            self.last = batch[-1]
+
+        if self.sensor_stats is not None:
+            self.sensor_stats.update(batch, batch_fields)
+
+    def print_report(self):
+        if not self.count:
+            print("\n⚠ No data found!")
+            return
+
+        print(f"\n{'='*60}")
+        print("DATA SUMMARY")
+        print(f"{'='*60}")
+
+        # Count documents
+        print(f"Total documents: {self.count}")
+
+        sensor_fields = self.fields - METADATA_FIELDS
+        print(f"Sensor fields found: {', '.join(sorted(sensor_fields))}")
+
+        # Time range
+        if self.oldest is not None:
+            duration = self.newest - self.oldest
 
             print(f"\nTime range:")
-            print(f"  Oldest: {oldest.strftime('%Y-%m-%d %H:%M:%S')}")
-            print(f"  Newest: {newest.strftime('%Y-%m-%d %H:%M:%S')}")
+            print(f"  Oldest: {self.oldest.strftime('%Y-%m-%d %H:%M:%S')}")
+            print(f"  Newest: {self.newest.strftime('%Y-%m-%d %H:%M:%S')}")
             print(f"  Duration: {duration}")
 
-    # Sample data (first document)
-    print(f"\nSample document:")
-    sample = data[0].copy()
-    sample.pop("_id", None)
-    for key, value in list(sample.items())[:5]:  # Show first 5 fields
-        if isinstance(value, datetime):
-            value = value.strftime("%Y-%m-%d %H:%M:%S")
-        print(f"  {key}: {value}")
+        # Per-sensor statistics
+        if self.sensor_stats is not None:
+            self.sensor_stats.print_report()
+        else:
+            print(f"\n(Install numpy for per-sensor statistics: pip install numpy)")
 
-    if len(sample) > 5:
-        print(f"  ... and {len(sample) - 5} more fields")
+        # Sample data (first document)
+        print(f"\nSample document:")
+        sample = dict(self.sample)
+        sample.pop("_id", None)
+        for key, value in list(sample.items())[:5]:  # Show first 5 fields
+            if isinstance(value, datetime):
+                value = value.strftime("%Y-%m-%d %H:%M:%S")
+            print(f"  {key}: {value}")
 
+        if len(sample) > 5:
+            print(f"  ... and {len(sample) - 5} more fields")
 
-def main():
-    """Main export function"""
-    print("=" * 60)
-    print("Student Data Export Tool")
-    print("=" * 60)
-    print()
 
-    # Connect to database
-    client, collection = connect_to_database()
+def print_summary(data):
+    """Print summary statistics about the data"""
+    summary = SummaryCollector(exact_stats=True)
+    for batch in iter_batches(data, BATCH_SIZE):
+        summary.update(batch)
+    summary.print_report()
 
-    # Build query
-    query = build_query()
 
-    # Fetch data
-    print(f"\nFetching data...")
+def print_no_data_help():
+    """Print troubleshooting tips when the query matched nothing"""
+    print("\n⚠ No data found with current filters!")
+    print("\nTroubleshooting:")
+    print("  1. Check if ESP32 is sending data")
+    print("  2. Check bridge is running")
+    print("  3. Try removing time filter (set HOURS_TO_EXPORT = None)")
+
+
+def stream_export(batches, writers, show_progress=True):
+    """
+    Stream document batches into the export files
+
+    Every batch is handed to each writer, and the summary is collected
+    during the same pass.
+
+    Args:
+        batches: Generator of document batches (see fetch_batches())
+        writers: Writers from open_stream_writers()
+        show_progress: Print a running document count
+
+    Returns:
+        SummaryCollector: Statistics for the exported documents
+    """
+    summary = SummaryCollector()
+
     try:
-        cursor = collection.find(query).sort("timestamp", -1)
+        while True:
+            with metrics.phase("fetch"):
+                batch = next(batches, None)
+            if batch is None:
+                break
+            metrics.add("documents", len(batch))
+
+            with metrics.phase("summary"):
+                summary.update(batch)
+            with metrics.profile():
+                for writer in writers:
+                    writer.write_batch(batch)
+            if show_progress:
+                print(f"  Exported {summary.count} documents...", end="\r")
+    except Exception:
+        batches.close()  # Stops any parallel fetch workers
+        for writer in writers:
+            writer.abort()
+        raise
+    finally:
+        if show_progress:
+            print(" " * 50, end="\r")  # Clear the progress line
+
+    with metrics.profile():
+        for writer in writers:
+            writer.close()
+
+    return summary
+
+
+async def async_stream_export(batches, writers):
+    """
+    Export with overlapping fetch, summary and writer stages
+
+    One task pulls batches from fetch_batches(), one updates the summary
+    and every writer has its own task, all joined by bounded queues. Each
+    stage runs its blocking work in a worker thread so the others keep
+    going meanwhile, and the slowest stage sets the pace.
+
+    Args:
+        batches: Generator of document batches (see fetch_batches())
+        writers: Writers from open_stream_writers()
+
+    Returns:
+        SummaryCollector: Statistics for the exported documents
+    """
+    loop = asyncio.get_running_loop()
+    # One thread owns the generator, so it is never resumed from two threads
+    fetcher = ThreadPoolExecutor(max_workers=1)
+    summary = SummaryCollector()
+
+    fetched = asyncio.Queue(maxsize=PREFETCH_BATCHES)
+    writer_queues = [asyncio.Queue(maxsize=PREFETCH_BATCHES) for _ in writers]
+
+    async def fetch():
+        while True:
+            with metrics.phase("fetch"):
+                batch = await loop.run_in_executor(fetcher, next, batches, None)
+            if batch is None:
+                break
+            metrics.add("documents", len(batch))
+            await fetched.put(batch)
+        await fetched.put(None)
+
+    async def summarize():
+        while True:
+            batch = await fetched.get()
+            if batch is not None:
+                with metrics.phase("summary"):
+                    await asyncio.to_thread(summary.update, batch)
+                print(f"  Exported {summary.count} documents...", end="\r")
+
+            # Every writer gets the same batch (and the final None)
+            for writer_queue in writer_queues:
+                await writer_queue.put(batch)
+            if batch is None:
+                break
+
+    async def write(writer, writer_queue):
+        while True:
+            batch = await writer_queue.get()
+            if batch is None:
+                break
+            await asyncio.to_thread(writer.write_batch, batch)
+
+    tasks = [asyncio.ensure_future(fetch()), asyncio.ensure_future(summarize())]
+    tasks += [
+        asyncio.ensure_future(write(writer, writer_queue))
+        for writer, writer_queue in zip(writers, writer_queues)
+    ]
 
-        # Apply limit if specified
-        if MAX_DOCUMENTS is not None:
-            cursor = cursor.limit(MAX_DOCUMENTS)
-            print(f"  Limiting to {MAX_DOCUMENTS} documents")
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        fetcher.shutdown(wait=True)  # Let a running next() finish first
+        batches.close()  # Stops any parallel fetch workers
+        for writer in writers:
+            writer.abort()
+        raise
+    finally:
+        print(" " * 50, end="\r")  # Clear the progress line
+        fetcher.shutdown(wait=True)
+
+    for writer in writers:
+        writer.close()
+
+    return summary
+
+
+def run_async_export(client, collection, query):
+    """Fetch, summarize and write JSON/CSV concurrently (see async_stream_export)"""
+    print(f"\n{'='*60}")
+    print("ASYNC EXPORT")
+    print(f"{'='*60}")
+    print(f"  Batch size: {BATCH_SIZE}, queue size: {PREFETCH_BATCHES} batches")
 
-        # Convert cursor to list
-        data = list(cursor)
+    try:
+        batches = fetch_batches(collection, query)
+        summary = asyncio.run(async_stream_export(batches, open_stream_writers()))
+    except Exception as e:
+        print(f"✗ Async export failed: {e}")
+        client.close()
+        sys.exit(1)
+
+    if not summary.count:
+        print_no_data_help()
+        client.close()
+        sys.exit(0)
+
+    summary.print_report()
+
+
+def run_export(client, collection, query):
+    """Fetch all matching documents into memory, summarize, then export"""
+    # Fetch data
+    print(f"\nFetching data...")
+    try:
+        # Collect every batch into one list
+        with metrics.phase("fetch"):
+            batches = fetch_batches(collection, query)
+            data = [doc for batch in batches for doc in batch]
+        metrics.add("documents", len(data))
 
         if not data:
-            print("\n⚠ No data found with current filters!")
-            print("\nTroubleshooting:")
-            print("  1. Check if ESP32 is sending data")
-            print("  2. Check bridge is running")
-            print("  3. Try removing time filter (set HOURS_TO_EXPORT = None)")
+            print_no_data_help()
             client.close()
             sys.exit(0)
 
@@ -261,35 +3242,432 @@ def main():
         sys.exit(1)
 
     # Print summary
-    print_summary(data)
+    with metrics.phase("summary"):
+        print_summary(data)
 
     # Export based on format
     print(f"\n{'='*60}")
     print("EXPORTING DATA")
     print(f"{'='*60}")
 
-    if EXPORT_FORMAT in ["json", "both"]:
-        json_filename = f"{OUTPUT_FILENAME}.json"
-        export_to_json(data, json_filename)
+    with metrics.profile():
+        if EXPORT_FORMAT in ["json", "both"]:
+            export_to_json(data, json_filename())
 
-    if EXPORT_FORMAT in ["csv", "both"]:
-        csv_filename = f"{OUTPUT_FILENAME}.csv"
-        export_to_csv(data, csv_filename)
+        if EXPORT_FORMAT in ["csv", "both"]:
+            export_to_csv(data, csv_filename())
+
+        if EXPORT_FORMAT in ["parquet", "arrow"]:
+            filename = f"{OUTPUT_FILENAME}.{EXPORT_FORMAT}"
+            export_to_columnar(data, filename, EXPORT_FORMAT)
+
+        if EXPORT_FORMAT == "binary":
+            export_to_binary(data, f"{OUTPUT_FILENAME}.bin")
+
+
+def run_streaming_export(client, collection, query):
+    """Fetch, summarize and export in a single streaming pass"""
+    print(f"\n{'='*60}")
+    print("STREAMING EXPORT")
+    print(f"{'='*60}")
+    print(f"  Batch size: {BATCH_SIZE}")
+
+    try:
+        batches = fetch_batches(collection, query)
+        summary = stream_export(batches, open_stream_writers())
+    except Exception as e:
+        print(f"✗ Streaming export failed: {e}")
+        client.close()
+        sys.exit(1)
+
+    if not summary.count:
+        print_no_data_help()
+        client.close()
+        sys.exit(0)
+
+    # Summary was gathered while exporting
+    summary.print_report()
+
+
+def run_pivot_export(client, collection, query):
+    """Export long-format readings as a wide table, one column per sensor"""
+    print(f"\n{'='*60}")
+    print("PIVOT EXPORT")
+    print(f"{'='*60}")
+
+    if np is None:
+        print("✗ Pivot export needs numpy")
+        print("  Install it with: pip install numpy")
+        client.close()
+        sys.exit(1)
+
+    try:
+        batches = pivot_batches(collection, query)
+        summary = stream_export(batches, open_stream_writers())
+    except Exception as e:
+        print(f"✗ Pivot export failed: {e}")
+        client.close()
+        sys.exit(1)
+
+    if not summary.count:
+        print_no_data_help()
+        client.close()
+        sys.exit(0)
+
+    summary.print_report()
+
+
+def run_resumable_export(client, collection, query):
+    """Stream the export page by page, continuing an unfinished earlier run"""
+    print(f"\n{'='*60}")
+    print("RESUMABLE EXPORT")
+    print(f"{'='*60}")
+    print(f"  Page size: {PAGE_SIZE}")
+
+    # Resuming means cutting files back to a saved size, which only works
+    # for plain json/csv files
+    resumable = EXPORT_FORMAT in ["json", "csv", "both"] and not OUTPUT_COMPRESSION
+    if not resumable:
+        print(f"  ⚠ {EXPORT_FORMAT}/{OUTPUT_COMPRESSION} files can't be resumed")
+        print("    Failed pages are still retried, but a stopped run starts over")
+
+    state = load_resume_state() if resumable else None
+    writers = open_stream_writers()
+
+    after = None
+    skip_count = 0
+    if state is not None:
+        for writer in writers:
+            if writer.filename in state["files"]:
+                writer.resume(state["files"][writer.filename])
+        after = (state["timestamp"], state["_id"])
+        skip_count = state["count"]
+        print(f"  Resuming after {skip_count} documents ({resume_state_filename()})")
+
+    def on_page(last_doc, count):
+        if not resumable:
+            return
+        if last_doc is not None:
+            save_resume_state(last_doc, count, writers)
+        elif os.path.exists(resume_state_filename()):
+            # Everything is fetched - the next run starts from the beginning
+            os.remove(resume_state_filename())
+
+    try:
+        batches = keyset_batches(collection, query, after, skip_count, on_page)
+        summary = stream_export(batches, writers)
+    except Exception as e:
+        print(f"✗ Resumable export failed: {e}")
+        if resumable:
+            print("  Run the export again to continue from the last saved page")
+        client.close()
+        sys.exit(1)
+
+    if not summary.count and not skip_count:
+        print_no_data_help()
+        client.close()
+        sys.exit(0)
+
+    if skip_count:
+        print(f"\n(Summary covers the {summary.count} documents fetched in this run)")
+    summary.print_report()
+
+
+def run_incremental_export(client, collection, query, checkpoint):
+    """Append documents newer than the checkpoint, then move the checkpoint"""
+    print(f"\n{'='*60}")
+    print("INCREMENTAL EXPORT")
+    print(f"{'='*60}")
+
+    if checkpoint is not None:
+        restore_output_files(checkpoint)
+
+    # Oldest first, so the files grow in time order and the last document
+    # written is the new checkpoint
+    if MAX_DOCUMENTS is not None:
+        print(f"  Limiting to {MAX_DOCUMENTS} documents")
+    sort = [("timestamp", 1), ("_id", 1)]
+    batches = cursor_batches(collection, query, sort, MAX_DOCUMENTS)
+
+    writers = open_stream_writers(append=True)
+    if not writers:
+        # Moving the checkpoint without writing anything would lose these rows
+        print(f"✗ No appendable output for EXPORT_FORMAT {EXPORT_FORMAT}")
+        print("  Use json, csv or both - the checkpoint was not moved")
+        client.close()
+        sys.exit(1)
+
+    try:
+        summary = stream_export(batches, writers)
+    except Exception as e:
+        print(f"✗ Incremental export failed: {e}")
+        print("  Checkpoint not moved - the next run will retry these documents")
+        client.close()
+        sys.exit(1)
+
+    if not summary.count:
+        print("\n✓ No new documents since the last export")
+        return
+
+    save_checkpoint(summary.last, [writer.filename for writer in writers])
+    print(f"✓ Checkpoint saved: {checkpoint_filename()}")
+
+    summary.print_report()
+
+
+def print_profile(profiler, filename):
+    """Print the slowest serialization functions and save the full profile"""
+    profiler.dump_stats(filename)
+
+    print(f"\n{'='*60}")
+    print("SERIALIZATION PROFILE (top 15 by cumulative time)")
+    print(f"{'='*60}")
+    pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+    print(
+        f"✓ Full profile saved to {filename} (open with: python -m pstats {filename})"
+    )
+
+
+def list_team_databases(client):
+    """List the workshop team databases (same rule as database_setup.py)"""
+    all_dbs = client.list_database_names()
+    return sorted(db for db in all_dbs if db.startswith("workshop_"))
+
+
+def export_team(client, db_name, query):
+    """
+    Stream one team database into its own export files
+
+    Returns:
+        dict: Team export result (documents, seconds, bytes written or error)
+    """
+    start = time.perf_counter()
+    output_filename = f"{db_name}_{COLLECTION_NAME}"
+
+    try:
+        collection = client[db_name][COLLECTION_NAME]
+        writers = open_stream_writers(output_filename=output_filename)
+        batches = fetch_batches(collection, query)
+        summary = stream_export(batches, writers, show_progress=False)
+    except Exception as e:
+        return {"name": db_name, "error": str(e)}
+
+    files = [writer.filename for writer in writers if os.path.exists(writer.filename)]
+    return {
+        "name": db_name,
+        "doc_count": summary.count,
+        "seconds": time.perf_counter() - start,
+        "bytes_written": sum(os.path.getsize(name) for name in files),
+        "files": files,
+    }
+
+
+def print_throughput_report(results, wall_seconds):
+    """Print per-team and overall export throughput"""
+    print(f"\n{'='*70}")
+    print("THROUGHPUT REPORT")
+    print(f"{'='*70}")
+    print(f"{'Database':<25} {'Docs':>10} {'Seconds':>9} {'Docs/s':>10} {'MB':>9}")
+    print("-" * 70)
+
+    total_docs = 0
+    total_bytes = 0
+    team_seconds = 0
+
+    for result in sorted(results, key=lambda r: r["name"]):
+        if "error" in result:
+            print(f"{result['name']:<25} ERROR: {result['error']}")
+            continue
+
+        rate = result["doc_count"] / result["seconds"] if result["seconds"] else 0
+        size_mb = result["bytes_written"] / (1024 * 1024)
+        print(
+            f"{result['name']:<25} {result['doc_count']:>10} "
+            f"{result['seconds']:>9.1f} {rate:>10.0f} {size_mb:>9.2f}"
+        )
+
+        total_docs += result["doc_count"]
+        total_bytes += result["bytes_written"]
+        team_seconds += result["seconds"]
+
+    rate = total_docs / wall_seconds if wall_seconds else 0
+    print("-" * 70)
+    print(
+        f"{'TOTAL':<25} {total_docs:>10} {wall_seconds:>9.1f} {rate:>10.0f} "
+        f"{total_bytes / (1024 * 1024):>9.2f}"
+    )
+    if wall_seconds:
+        print(f"\nSum of team times: {team_seconds:.1f}s")
+        print(f"Speedup from concurrency: {team_seconds / wall_seconds:.1f}x")
+
+
+def run_all_teams_export(client, query):
+    """Export every workshop_* database concurrently over one client"""
+    print(f"\n{'='*60}")
+    print("ALL TEAMS EXPORT")
+    print(f"{'='*60}")
+
+    db_names = list_team_databases(client)
+    if not db_names:
+        print("\n⚠ No workshop databases found!")
+        client.close()
+        sys.exit(0)
+
+    print(f"  Teams: {len(db_names)}")
+    print(f"  Concurrency: {TEAM_CONCURRENCY}")
+    print()
+
+    start = time.perf_counter()
+    results = []
+
+    with ThreadPoolExecutor(max_workers=TEAM_CONCURRENCY) as executor:
+        futures = [
+            executor.submit(export_team, client, db_name, query) for db_name in db_names
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if "error" in result:
+                print(f"  ✗ {result['name']}: {result['error']}")
+            else:
+                print(f"  ✓ {result['name']}: {result['doc_count']} documents")
+
+    metrics.databases = sorted(r["name"] for r in results if "error" not in r)
+    print_throughput_report(results, time.perf_counter() - start)
+
+
+def option_conflicts():
+    """
+    Find option combinations that would silently export the wrong data
+
+    Returns:
+        list: One message per conflict (empty if the options work together)
+    """
+    conflicts = []
+    if INCREMENTAL_EXPORT and PIVOT_EXPORT:
+        conflicts.append(
+            "PIVOT_EXPORT can't be combined with INCREMENTAL_EXPORT - the pivot "
+            "would only see the new readings and the checkpoint never moves"
+        )
+    if PIVOT_EXPORT and EXPORT_ALL_TEAMS:
+        conflicts.append(
+            "PIVOT_EXPORT can't be combined with EXPORT_ALL_TEAMS - the all-teams "
+            "export writes the readings unpivoted"
+        )
+    if INCREMENTAL_EXPORT and EXPORT_ALL_TEAMS:
+        conflicts.append(
+            "EXPORT_ALL_TEAMS can't be combined with INCREMENTAL_EXPORT - "
+            "there is one CHECKPOINT_FILE, not one per team"
+        )
+    if INCREMENTAL_EXPORT and EXPORT_FORMAT in ["parquet", "arrow", "binary"]:
+        conflicts.append(
+            f"EXPORT_FORMAT {EXPORT_FORMAT} can't be combined with "
+            "INCREMENTAL_EXPORT - the files can't be appended to (use json or csv)"
+        )
+    if INCREMENTAL_EXPORT:
+        incremental_options = {
+            "RESUMABLE_EXPORT": RESUMABLE_EXPORT,
+            "ASYNC_EXPORT": ASYNC_EXPORT,
+            "USE_CACHE": USE_CACHE,
+            "FETCH_WORKERS > 1": FETCH_WORKERS > 1,
+            "RESAMPLE_UNIT": RESAMPLE_UNIT is not None,
+        }
+        for option, is_set in incremental_options.items():
+            if is_set:
+                conflicts.append(
+                    f"{option} can't be combined with INCREMENTAL_EXPORT - the "
+                    "incremental export reads the new raw readings itself"
+                )
+    if RESUMABLE_EXPORT:
+        paged_options = {
+            "RESAMPLE_UNIT": RESAMPLE_UNIT is not None,
+            "USE_CACHE": USE_CACHE,
+            "FETCH_WORKERS > 1": FETCH_WORKERS > 1,
+        }
+        for option, is_set in paged_options.items():
+            if is_set:
+                conflicts.append(
+                    f"{option} can't be combined with RESUMABLE_EXPORT - the "
+                    "resumable export pages through the raw readings itself"
+                )
+    return conflicts
+
+
+def main():
+    """Main export function"""
+    print("=" * 60)
+    print("Student Data Export Tool")
+    print("=" * 60)
+    print()
+
+    if "--invalidate-cache" in sys.argv:
+        invalidate_cache()
+        return
+
+    conflicts = option_conflicts()
+    if conflicts:
+        for conflict in conflicts:
+            print(f"✗ {conflict}")
+        print("  Change the settings at the top of this file and run again")
+        sys.exit(1)
+
+    if PROFILE_SERIALIZATION:
+        metrics.profiler = cProfile.Profile()
+
+    # Connect to database
+    with metrics.phase("connect"):
+        client, collection = connect_to_database()
+
+    # Build query
+    checkpoint = load_checkpoint() if INCREMENTAL_EXPORT else None
+    query = build_query(checkpoint)
+
+    if EXPORT_ALL_TEAMS:
+        run_all_teams_export(client, query)
+    elif PIVOT_EXPORT:
+        run_pivot_export(client, collection, query)
+    elif INCREMENTAL_EXPORT:
+        run_incremental_export(client, collection, query, checkpoint)
+    elif RESUMABLE_EXPORT:
+        run_resumable_export(client, collection, query)
+    elif ASYNC_EXPORT:
+        run_async_export(client, collection, query)
+    elif STREAM_EXPORT:
+        run_streaming_export(client, collection, query)
+    else:
+        run_export(client, collection, query)
 
     # Close connection
     client.close()
+    shutdown_serialization_pool()
+
+    if metrics_enabled():
+        metrics.print_report()
+        metrics.save(f"{OUTPUT_FILENAME}.metrics.json")
+        print(f"\n✓ Metrics saved to {OUTPUT_FILENAME}.metrics.json")
+
+    if metrics.profiler is not None:
+        print_profile(metrics.profiler, f"{OUTPUT_FILENAME}.prof")
 
     print(f"\n{'='*60}")
     print("✓ EXPORT COMPLETE!")
     print(f"{'='*60}")
 
-    if EXPORT_FORMAT == "both":
-        print(f"\nYour data has been exported to:")
-        print(f"  • {OUTPUT_FILENAME}.json (for Python/JavaScript)")
-        print(f"  • {OUTPUT_FILENAME}.csv (for Excel/Pandas)")
-    else:
-        print(f"\nYour data has been exported to:")
-        print(f"  • {OUTPUT_FILENAME}.{EXPORT_FORMAT}")
+    output_filename = OUTPUT_FILENAME
+    if EXPORT_ALL_TEAMS:
+        output_filename = f"<database>_{COLLECTION_NAME}"
+
+    print(f"\nYour data has been exported to:")
+    if EXPORT_FORMAT in ["json", "both"]:
+        print(f"  • {json_filename(output_filename)} (for Python/JavaScript)")
+    if EXPORT_FORMAT in ["csv", "both"]:
+        print(f"  • {csv_filename(output_filename)} (for Excel/Pandas)")
+    if EXPORT_FORMAT == "parquet":
+        print(f"  • {output_filename}.parquet (for Pandas: pd.read_parquet)")
+    if EXPORT_FORMAT == "arrow":
+        print(f"  • {output_filename}.arrow (for Pandas: pd.read_feather)")
+    if EXPORT_FORMAT == "binary":
+        print(f"  • {output_filename}.bin (for NumPy: data_export.BinaryExport)")
 
     print("\nNext steps:")
     print("  • Open CSV in Excel for charts")
@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Export Benchmark Tool
+Measures how data_export.py performs as the amount of data grows
+"""
+
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+
+import bson
+from pymongo import MongoClient
+
+import data_export
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Local MongoDB used for the benchmark data (never point this at Atlas!)
+# Set to None to use an in-memory stand-in instead of a real server
+BENCHMARK_URI = "mongodb://localhost:27017"
+
+# Database / collection the synthetic data is written to (dropped first)
+BENCHMARK_DATABASE = "benchmark_export"
+BENCHMARK_COLLECTION = "sensor_data"
+
+# Number of documents to test with
+SIZES = [100_000, 1_000_000, 5_000_000]
+
+# Document layout:
+#   SCHEMA = "long"   # sensor_name / sensor_value, like publishData() in the ESP32 sketch
+#   SCHEMA = "wide"   # One key per sensor: temperature, humidity, light
+SCHEMA = "long"
+
+# Time between generated readings (the ESP32 sketch publishes every 500 ms)
+READING_INTERVAL_MS = 500
+
+# Folder for the result files (benchmark_YYYYmmdd_HHMMSS.json)
+RESULTS_DIR = "benchmark_results"
+
+# Earlier result file to compare against (None = no comparison)
+#   COMPARE_WITH = "benchmark_results/benchmark_20250115_103045.json"
+COMPARE_WITH = None
+
+# ============================================================================
+# SYNTHETIC DATA
+# ============================================================================
+
+LONG_SENSORS = ["dht_sensor", "light_sensor", "accelerometer"]
+
+
+def timestamp_readable(ts):
+    """Same format as timeConverter() in the MQTT bridge"""
+    return f"{ts.day} {ts.strftime('%b %Y %H:%M:%S')}"
+
+
+def generate_documents(count, schema=SCHEMA, team="team01", seed=42):
+    """
+    Generate documents in the bridge's schema, oldest first
+
+    Args:
+        count: Number of documents
+        schema: "long" (sensor_name/sensor_value) or "wide" (one key per sensor)
+        team: Team name for the team/topic fields
+        seed: Random seed so every run gets the same data
+
+    Yields:
+        dict: One sensor document
+    """
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    step = timedelta(milliseconds=READING_INTERVAL_MS)
+
+    for i in range(count):
+        ts = start + step * i
+        doc = {
+            "timestamp": ts,
+            "timestamp_readable": timestamp_readable(ts),
+            "team": team,
+            "topic": team,
+        }
+
+        if schema == "long":
+            doc["sensor_name"] = LONG_SENSORS[i % len(LONG_SENSORS)]
+            # The ESP32 sketch sends its readings as strings
+            doc["sensor_value"] = f"{rng.uniform(15, 30):.2f}"
+        else:
+            doc["temperature"] = round(rng.uniform(15, 30), 2)
+            doc["humidity"] = round(rng.uniform(30, 70), 2)
+            doc["light"] = rng.randint(0, 1023)
+
+        yield doc
+
+
+class InMemoryCursor:
+    """Minimal find() cursor over BSON-encoded documents"""
+
+    def __init__(self, encoded, projection=None, descending=False):
+        self.encoded = encoded
+        self.projection = projection
+        self.descending = descending
+        self._limit = None
+        self._batch_size = 1000
+
+    def sort(self, key, direction=1):
+        if isinstance(key, list):
+            key, direction = key[0]
+        self.descending = direction == -1
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, size):
+        self._batch_size = size
+        return self
+
+    def __iter__(self):
+        encoded = self.encoded[::-1] if self.descending else self.encoded
+        if self._limit is not None:
+            encoded = encoded[: self._limit]
+
+        # Decode batch by batch, like the driver does with server replies
+        for start in range(0, len(encoded), self._batch_size):
+            for doc in bson.decode_all(
+                b"".join(encoded[start : start + self._batch_size])
+            ):
+                yield data_export.apply_projection(doc, self.projection)
+
+
+class InMemoryDatabase:
+    def __init__(self, name):
+        self.name = name
+
+
+class InMemoryCollection:
+    """
+    Stand-in for a MongoDB collection when no local server is available
+
+    Documents are kept BSON-encoded so decoding costs are still measured.
+    Only what the plain export path needs is supported: find() with an
+    empty filter and a projection, sort on timestamp, limit and batch_size
+    (see standin_problems()).
+    """
+
+    def __init__(self, docs):
+        self.name = BENCHMARK_COLLECTION
+        self.database = InMemoryDatabase(BENCHMARK_DATABASE)
+        self.encoded = [bson.encode(doc) for doc in docs]
+
+    def find(self, query=None, projection=None):
+        if query:
+            raise ValueError(
+                f"The in-memory stand-in only supports find({{}}), got filter {query}"
+            )
+        return InMemoryCursor(self.encoded, projection)
+
+
+def standin_problems():
+    """
+    Find data_export.py settings the in-memory stand-in can't serve
+
+    Returns:
+        list: One message per setting (empty if the stand-in can be used)
+    """
+    unsupported = {
+        "RESAMPLE_UNIT": data_export.RESAMPLE_UNIT is not None,
+        "USE_CACHE": data_export.USE_CACHE,
+        "FETCH_WORKERS > 1": data_export.FETCH_WORKERS > 1,
+    }
+    return [
+        f"{setting} in data_export.py needs a real server (set BENCHMARK_URI)"
+        for setting, is_set in unsupported.items()
+        if is_set
+    ]
+
+
+def load_mongod(client, count):
+    """Drop and refill the benchmark collection on the local server"""
+    db = client[BENCHMARK_DATABASE]
+    db.drop_collection(BENCHMARK_COLLECTION)
+    db.create_collection(
+        BENCHMARK_COLLECTION,
+        timeseries={
+            "timeField": "timestamp",
+            "metaField": "team",
+            "granularity": "seconds",
+        },
+    )
+    collection = db[BENCHMARK_COLLECTION]
+
+    batch = []
+    for doc in generate_documents(count):
+        batch.append(doc)
+        if len(batch) >= 10_000:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+
+    return collection
+
+
+# ============================================================================
+# MEASUREMENT
+# ============================================================================
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB (None if unavailable)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def timed(phases, name, count, func, *args):
+    """Run func, recording seconds and docs/sec under phases[name]"""
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        result = func(*args)
+    seconds = time.perf_counter() - start
+
+    phases[name] = {
+        "seconds": round(seconds, 4),
+        "docs_per_sec": round(count / seconds) if seconds else None,
+    }
+    return result
+
+
+def output_size(output_filename):
+    """Total size of the export files written for output_filename"""
+    folder = os.path.dirname(output_filename)
+    prefix = os.path.basename(output_filename)
+    return sum(
+        os.path.getsize(os.path.join(folder, name))
+        for name in os.listdir(folder)
+        if name.startswith(prefix)
+    )
+
+
+def run_case(size, mode):
+    """
+    Benchmark one size in one mode (runs in its own process)
+
+    Args:
+        size: Number of documents
+        mode: "in_memory" (the default export) or "streaming"
+
+    Returns:
+        dict: Timings for each phase, peak RSS and output size
+    """
+    if BENCHMARK_URI is None:
+        client = None
+        collection = InMemoryCollection(generate_documents(size))
+    else:
+        client = MongoClient(BENCHMARK_URI)
+        collection = client[BENCHMARK_DATABASE][BENCHMARK_COLLECTION]
+
+    baseline_rss = peak_rss_mb()
+    phases = {}
+
+    with tempfile.TemporaryDirectory() as folder:
+        data_export.OUTPUT_FILENAME = os.path.join(folder, "benchmark")
+        data_export.EXPORT_FORMAT = "both"
+        data_export.STREAM_EXPORT = mode == "streaming"
+
+        def fetch():
+            batches = data_export.fetch_batches(collection, {})
+            return [doc for batch in batches for doc in batch]
+
+        if mode == "in_memory":
+            data = timed(phases, "fetch", size, fetch)
+            timed(phases, "summary", size, data_export.print_summary, data)
+            timed(
+                phases,
+                "json",
+                size,
+                data_export.export_to_json,
+                data,
+                data_export.json_filename(),
+            )
+            timed(
+                phases,
+                "csv",
+                size,
+                data_export.export_to_csv,
+                data,
+                data_export.csv_filename(),
+            )
+        else:
+
+            def stream():
+                batches = data_export.fetch_batches(collection, {})
+                writers = data_export.open_stream_writers()
+                return data_export.stream_export(batches, writers, show_progress=False)
+
+            timed(phases, "stream_all", size, stream)
+
+        written = output_size(data_export.OUTPUT_FILENAME)
+
+    if client is not None:
+        client.close()
+
+    total = sum(phase["seconds"] for phase in phases.values())
+    return {
+        "size": size,
+        "mode": mode,
+        "phases": phases,
+        "total_seconds": round(total, 4),
+        "docs_per_sec": round(size / total) if total else None,
+        "baseline_rss_mb": baseline_rss,
+        "peak_rss_mb": peak_rss_mb(),
+        "output_bytes": written,
+    }
+
+
+def print_results(runs):
+    """Print a results table"""
+    print(f"\n{'='*78}")
+    print("RESULTS")
+    print(f"{'='*78}")
+    print(
+        f"{'Docs':>10} {'Mode':<11} {'Fetch':>8} {'Summary':>8} {'JSON':>8} "
+        f"{'CSV':>8} {'Docs/s':>9} {'Peak MB':>8}"
+    )
+    print("-" * 78)
+
+    for run in runs:
+        phases = run["phases"]
+
+        def seconds(name):
+            return f"{phases[name]['seconds']:.2f}" if name in phases else "-"
+
+        peak = f"{run['peak_rss_mb']:.0f}" if run["peak_rss_mb"] else "-"
+        if run["mode"] == "streaming":
+            columns = f"{'(single pass)':>35}"
+        else:
+            columns = (
+                f"{seconds('fetch'):>8} {seconds('summary'):>8} "
+                f"{seconds('json'):>8} {seconds('csv'):>8}"
+            )
+        print(
+            f"{run['size']:>10} {run['mode']:<11} {columns} "
+            f"{run['docs_per_sec'] or 0:>9} {peak:>8}"
+        )
+
+
+def compare_results(runs, filename):
+    """Print the docs/sec change against an earlier result file"""
+    with open(filename, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+
+    earlier = {(run["size"], run["mode"]): run for run in previous["runs"]}
+
+    print(f"\nCompared with {filename}:")
+    for run in runs:
+        old = earlier.get((run["size"], run["mode"]))
+        if not old or not old["docs_per_sec"] or not run["docs_per_sec"]:
+            continue
+
+        change = (run["docs_per_sec"] / old["docs_per_sec"] - 1) * 100
+        marker = "⚠" if change < -10 else "✓"
+        print(
+            f"  {marker} {run['size']:>10} {run['mode']:<11} "
+            f"{old['docs_per_sec']:>9} → {run['docs_per_sec']:>9} docs/s ({change:+.1f}%)"
+        )
+
+
+def main():
+    """Main benchmark function"""
+    print("=" * 78)
+    print("Export Benchmark Tool")
+    print("=" * 78)
+    print(f"Sizes: {', '.join(str(size) for size in SIZES)}")
+    print(f"Schema: {SCHEMA}")
+    print(f"Backend: {BENCHMARK_URI or 'in-memory stand-in'}")
+
+    problems = standin_problems() if BENCHMARK_URI is None else []
+    if problems:
+        for problem in problems:
+            print(f"✗ {problem}")
+        sys.exit(1)
+
+    runs = []
+    for size in SIZES:
+        if BENCHMARK_URI is not None:
+            print(f"\nLoading {size} documents into {BENCHMARK_DATABASE}...")
+            client = MongoClient(BENCHMARK_URI, serverSelectionTimeoutMS=5000)
+            load_mongod(client, size)
+            client.close()
+
+        for mode in ["in_memory", "streaming"]:
+            print(f"  Running {mode} export of {size} documents...")
+            # A fresh process per case so peak RSS belongs to this case only
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                runs.append(executor.submit(run_case, size, mode).result())
+
+    print_results(runs)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    filename = os.path.join(
+        RESULTS_DIR, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    results = {
+        "created": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": "mongod" if BENCHMARK_URI else "memory",
+        "schema": SCHEMA,
+        "runs": runs,
+    }
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✓ Results saved to {filename}")
+
+    if COMPARE_WITH:
+        compare_results(runs, COMPARE_WITH)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠ Benchmark cancelled by user")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n✗ Unexpected error: {e}")
+        import traceback
+
+        traceback.print_exc()
+        sys.exit(1)
@@ -5,9 +5,17 @@ Safely deletes existing workshop databases and recreates them with TimeSeries co
 """
 
 from pymongo import MongoClient
-from pymongo.errors import CollectionInvalid, OperationFailure
-from datetime import datetime
+from pymongo.errors import BulkWriteError, CollectionInvalid, OperationFailure
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import bson
+from bson import json_util
+import gzip
+import hashlib
+import json
+import os
 import sys
+import threading
 import time
 
 # ============================================================================
@@ -35,15 +43,203 @@ TEAMS = [
 COLLECTION_NAME = "sensor_data"
 TIME_FIELD = "timestamp"
 META_FIELD = "team"
+GRANULARITY = "seconds"  # "seconds", "minutes" or "hours"
+
+# Bucket span in seconds (None = use GRANULARITY). Sets bucketMaxSpanSeconds
+# and bucketRoundingSeconds (MongoDB 6.3+) - match it to how fast a team
+# publishes so buckets fill up instead of many half-empty ones.
+# SETUP_MODE = "analyze" suggests a value from each team's data.
+BUCKET_SPAN_SECONDS = None
+
+# Delete readings older than this many seconds (None = keep forever)
+#   EXPIRE_AFTER_SECONDS = 30 * 24 * 3600   # Keep 30 days
+EXPIRE_AFTER_SECONDS = None
+
+# Create secondary indexes: team + timestamp (time-range reads) and sensor_name
+# (MongoDB 6.0+ - set to False on a 5.x server)
+CREATE_INDEXES = True
+
+# Rollup collections kept next to COLLECTION_NAME (sensor_data_minute,
+# sensor_data_hour): one document per sensor per window with the count, sum,
+# min and max of every numeric field. data_export.py reads them for
+# RESAMPLE_UNIT exports. Finest first - each rollup is built from the one
+# before it. Set to {} to turn them off.
+# Refresh with: python database_setup.py --refresh-rollups
+ROLLUPS = {"minute": 60, "hour": 3600}
+
+# How late a reading can arrive - each refresh recomputes this far back
+ROLLUP_LATENESS_SECONDS = 60
+
+# Per-team overrides of GRANULARITY / BUCKET_SPAN_SECONDS / EXPIRE_AFTER_SECONDS
+#   TEAM_SETTINGS = {
+#       "team03": {"bucket_span_seconds": 3600, "expire_after_seconds": 604800},
+#       "team07": {"granularity": "minutes"},
+#   }
+TEAM_SETTINGS = {}
+
+# What the script does:
+#   SETUP_MODE = "reset"   # Delete every workshop_* database and create them again
+#   SETUP_MODE = "plan"    # Only show what "apply" would change
+#   SETUP_MODE = "apply"   # Change only the databases that differ from the settings above
+#   SETUP_MODE = "analyze" # Sample each team's data and suggest bucket settings
+#   SETUP_MODE = "monitor" # Keep polling database sizes (see MONITOR below)
+SETUP_MODE = "reset"
+
+# Newest readings per team that "analyze" looks at
+ANALYZE_SAMPLE_SIZE = 2000
+
+# In plan/apply mode: also delete workshop_* databases of teams not in TEAMS
+DROP_UNKNOWN_DATABASES = False
 
 # Safety settings
 REQUIRE_CONFIRMATION = True  # Set to False to skip confirmation prompt
 
+# ============================================================================
+# ARCHIVE / RESTORE
+# ============================================================================
+
+# Save a copy of every database before it is deleted (reset, recreate, drop).
+# Each run gets its own folder: ARCHIVE_DIR/YYYYmmdd_HHMMSS/ with gzipped
+# BSON chunk files and a manifest.json (Extended JSON) holding their SHA-256
+# checksums and the collection and index options.
+# Restore with: python database_setup.py --restore archives/20250115_103045
+ARCHIVE_BEFORE_DROP = True
+
+# Folder for the archives
+ARCHIVE_DIR = "archives"
+
+# Documents per archive chunk file
+ARCHIVE_CHUNK_DOCS = 100_000
+
+# Collections archived at the same time
+ARCHIVE_WORKERS = 4
+
+# Chunk files restored at the same time, and documents per insert_many
+RESTORE_WORKERS = 8
+RESTORE_BATCH_SIZE = 5000
+
+# ============================================================================
+# MONITOR (SETUP_MODE = "monitor")
+# ============================================================================
+
+# Seconds between polls. A poll is one $collStats per database - collection
+# metadata only, no documents are read - so it puts little load on the
+# cluster. Ingest rates are measured as data size growth (KB/s), since the
+# metadata of a TimeSeries collection counts buckets, not readings.
+MONITOR_INTERVAL_SECONDS = 60
+
+# Every poll is appended here as one JSON line (rates carry over restarts)
+MONITOR_HISTORY_FILE = "capacity_history.jsonl"
+
+# Storage budget for all workshop databases together, data + indexes
+# (Atlas M0 free tier: 512 MB)
+SIZE_BUDGET_MB = 512
+
+# The growth used for the "budget full in" projection is measured over this
+# many seconds of history
+MONITOR_RATE_WINDOW_SECONDS = 3600
+
+# Flag a team growing more than this many times faster than the median team
+RUNAWAY_FACTOR = 5
+
+# Stop after this many polls (None = until Ctrl+C)
+MONITOR_POLLS = None
+
+# ============================================================================
+# PERFORMANCE (Optional)
+# ============================================================================
+
+# Document counts come from collection metadata (instant). On a TimeSeries
+# collection the metadata only knows the number of buckets, so the reading
+# count is shown as "-" unless BUCKET_READING_COUNTS is on.
+# Set EXACT_COUNTS to True to count every document exactly - slow on big
+# collections.
+EXACT_COUNTS = False
+
+# TimeSeries only: add up the reading count stored in every bucket header.
+# Exact, but reads every bucket document (grows with the data) and needs
+# read access to system.buckets.<collection>.
+BUCKET_READING_COUNTS = False
+
+# Databases analyzed / deleted / created at the same time
+SETUP_WORKERS = 8
+
+# Rate limit for database operations (token bucket) so MongoDB isn't
+# overwhelmed. None = no limit.
+OPERATIONS_PER_SECOND = 20
+
+# Operations that may start at once before the rate limit kicks in
+RATE_BURST = 5
+
 # ============================================================================
 # FUNCTIONS
 # ============================================================================
 
 
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter
+
+    Holds up to `burst` tokens and refills `rate` tokens per second
+    (None = no limit). acquire() takes one token, waiting for a refill if
+    the bucket is empty.
+    """
+
+    def __init__(self, rate, burst=1):
+        if rate is not None and rate <= 0:
+            raise ValueError(f"rate must be above 0 or None (no limit), got {rate}")
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate is None:
+            return
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+def run_concurrently(func, items, limiter):
+    """
+    Call func(item) for every item on SETUP_WORKERS threads
+
+    Each call first takes a token from the rate limiter.
+
+    Args:
+        func: Function taking one item
+        items: Database or team names
+        limiter: TokenBucket shared by all operations
+
+    Returns:
+        list: Results in the same order as items
+    """
+
+    def limited(item):
+        limiter.acquire()
+        return func(item)
+
+    if not items:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(SETUP_WORKERS, len(items))) as executor:
+        return list(executor.map(limited, items))
+
+
 def list_existing_databases(client):
     """
     List all existing workshop databases
@@ -59,40 +255,121 @@ def list_existing_databases(client):
     return workshop_dbs
 
 
-def get_database_info(client, db_name):
+def count_timeseries_readings(db):
+    """
+    Count the readings of the sensor TimeSeries collection from its buckets
+
+    $collStats counts bucket documents on a TimeSeries collection, not
+    readings. Every bucket records how many readings it holds (control.count
+    on compressed buckets, the size of its time column otherwise). The count
+    is exact but reads every bucket document, so it grows with the data
+    (see BUCKET_READING_COUNTS).
+    """
+    buckets = db[f"system.buckets.{COLLECTION_NAME}"]
+    readings = {
+        "$ifNull": [
+            "$control.count",
+            {"$size": {"$objectToArray": f"$data.{TIME_FIELD}"}},
+        ]
+    }
+    result = list(
+        buckets.aggregate([{"$group": {"_id": None, "readings": {"$sum": readings}}}])
+    )
+    return result[0]["readings"] if result else 0
+
+
+def get_database_info(client, db_name, exact_counts=None, bucket_counts=None):
     """
     Get information about a database
 
+    Sizes and counts come from one $collStats call on the sensor collection,
+    which only reads collection metadata. For a regular collection the count
+    is the server's stored count. For a TimeSeries collection that count is
+    the number of buckets, so doc_count is None unless bucket_counts is on
+    (count_timeseries_readings(), one read per bucket). exact_counts counts
+    every document instead (a full collection scan).
+
     Args:
         client: MongoClient instance
         db_name: Database name
+        exact_counts: Count documents exactly (None = EXACT_COUNTS)
+        bucket_counts: Sum TimeSeries bucket headers (None = BUCKET_READING_COUNTS)
 
     Returns:
-        dict: Database information
+        dict: Database information (doc_count None if unknown)
     """
-    try:
-        db = client[db_name]
-        stats = db.command("dbStats")
-        collections = db.list_collection_names()
+    if exact_counts is None:
+        exact_counts = EXACT_COUNTS
+    if bucket_counts is None:
+        bucket_counts = BUCKET_READING_COUNTS
 
-        # Get document count
-        doc_count = 0
-        if COLLECTION_NAME in collections:
-            doc_count = db[COLLECTION_NAME].count_documents({})
-
-        # Check if TimeSeries
-        is_timeseries = False
-        if COLLECTION_NAME in collections:
-            coll_info = list(db.list_collections(filter={"name": COLLECTION_NAME}))[0]
-            is_timeseries = coll_info.get("type") == "timeseries"
+    try:
+        collection = client[db_name][COLLECTION_NAME]
+        try:
+            stats = next(
+                collection.aggregate(
+                    [{"$collStats": {"storageStats": {}, "count": {}}}]
+                )
+            )
+        except OperationFailure as e:
+            if e.code != 26:  # NamespaceNotFound - no sensor collection yet
+                raise
+            stats = None
+
+        if stats is None:
+            return {
+                "name": db_name,
+                "size_bytes": 0,
+                "size_mb": 0,
+                "storage_mb": 0,
+                "collections": [],
+                "doc_count": 0,
+                "exact_count": True,
+                "is_timeseries": False,
+                "bucket_count": None,
+                "index_mb": 0,
+                "compression": None,
+            }
+
+        storage = stats.get("storageStats", {})
+        timeseries = storage.get("timeseries")
+
+        exact_count = exact_counts
+        if exact_counts:
+            doc_count = collection.count_documents({})
+        elif timeseries is not None:
+            # stats["count"] would be the number of buckets
+            doc_count = None
+            if bucket_counts:
+                doc_count = count_timeseries_readings(client[db_name])
+                exact_count = True
+        else:
+            doc_count = stats.get("count", storage.get("count", 0))
+
+        # A TimeSeries collection's size is already column-compressed
+        # buckets, so size/storageSize would only show block compression
+        ts_compressed = (timeseries or {}).get("numBytesCompressed")
+        if ts_compressed:
+            compression = timeseries.get("numBytesUncompressed", 0) / ts_compressed
+        elif storage.get("storageSize"):
+            compression = storage.get("size", 0) / storage["storageSize"]
+        else:
+            compression = None
 
         return {
             "name": db_name,
-            "size_bytes": stats.get("dataSize", 0),
-            "size_mb": stats.get("dataSize", 0) / (1024 * 1024),
-            "collections": collections,
+            "size_bytes": storage.get("size", 0),
+            "size_mb": storage.get("size", 0) / (1024 * 1024),
+            "storage_mb": storage.get("storageSize", 0) / (1024 * 1024),
+            "collections": [COLLECTION_NAME],
             "doc_count": doc_count,
-            "is_timeseries": is_timeseries,
+            "exact_count": exact_count,
+            # Only time-series collections report bucket statistics
+            "is_timeseries": timeseries is not None,
+            "bucket_count": (timeseries or {}).get("bucketCount"),
+            "index_mb": storage.get("totalIndexSize", 0) / (1024 * 1024),
+            # Uncompressed / compressed size (bucket compression for TimeSeries)
+            "compression": compression,
         }
     except Exception as e:
         return {"name": db_name, "error": str(e)}
@@ -118,6 +395,56 @@ def delete_database(client, db_name):
         return False
 
 
+# Longest bucket span MongoDB uses for each granularity
+GRANULARITY_SPAN = {"seconds": 3600, "minutes": 86400, "hours": 2592000}
+
+
+def team_settings(team_name):
+    """Collection settings for a team: the defaults plus its TEAM_SETTINGS"""
+    settings = {
+        "granularity": GRANULARITY,
+        "bucket_span_seconds": BUCKET_SPAN_SECONDS,
+        "expire_after_seconds": EXPIRE_AFTER_SECONDS,
+    }
+    settings.update(TEAM_SETTINGS.get(team_name, {}))
+    return settings
+
+
+def timeseries_options(settings):
+    """Build the timeseries options for create_collection"""
+    options = {"timeField": TIME_FIELD, "metaField": META_FIELD}
+    span = settings["bucket_span_seconds"]
+    if span:
+        options["bucketMaxSpanSeconds"] = span
+        options["bucketRoundingSeconds"] = span
+    else:
+        options["granularity"] = settings["granularity"]
+    return options
+
+
+def required_version():
+    """
+    Oldest MongoDB version that supports the configured collection settings
+
+    Returns:
+        tuple: ((major, minor), setting that needs it)
+    """
+    spans = [BUCKET_SPAN_SECONDS]
+    spans += [team.get("bucket_span_seconds") for team in TEAM_SETTINGS.values()]
+    if any(spans):
+        return (6, 3), "bucket_span_seconds (bucketMaxSpanSeconds)"
+    if CREATE_INDEXES:
+        return (6, 0), "CREATE_INDEXES (sensor_name index on a TimeSeries collection)"
+    return (5, 0), "TimeSeries collections"
+
+
+def desired_indexes():
+    """Index keys every sensor collection should have (CREATE_INDEXES)"""
+    if not CREATE_INDEXES:
+        return []
+    return [[(META_FIELD, 1), (TIME_FIELD, 1)], [("sensor_name", 1)]]
+
+
 def create_timeseries_collection(client, team_name):
     """
     Create a TimeSeries collection for a team
@@ -135,17 +462,21 @@ def create_timeseries_collection(client, team_name):
         db = client[db_name]
 
         # Create TimeSeries collection
+        settings = team_settings(team_name)
+        options = {}
+        if settings["expire_after_seconds"]:
+            options["expireAfterSeconds"] = settings["expire_after_seconds"]
         db.create_collection(
-            COLLECTION_NAME,
-            timeseries={
-                "timeField": TIME_FIELD,
-                "metaField": META_FIELD,
-                "granularity": "seconds",
-            },
+            COLLECTION_NAME, timeseries=timeseries_options(settings), **options
         )
 
-        # Insert welcome document with proper Date object
+        # Secondary indexes for time-range and sensor_name queries
         collection = db[COLLECTION_NAME]
+        for keys in desired_indexes():
+            collection.create_index(keys)
+        create_rollup_collections(db)
+
+        # Insert welcome document with proper Date object
         welcome_doc = {
             TIME_FIELD: datetime.utcnow(),  # BSON Date object
             META_FIELD: team_name,
@@ -163,6 +494,582 @@ def create_timeseries_collection(client, team_name):
         return False
 
 
+# Tracks how far each rollup has been refreshed: one document per rollup
+ROLLUP_STATE_COLLECTION = "rollup_state"
+
+# Field types a rollup aggregates (strings are converted, like the bridge's)
+ROLLUP_VALUE_TYPES = ["double", "int", "long", "decimal", "string"]
+
+
+def rollup_collection_name(unit):
+    """Name of the rollup collection for a unit, e.g. sensor_data_minute"""
+    return f"{COLLECTION_NAME}_{unit}"
+
+
+def create_rollup_collections(db):
+    """Create the ROLLUPS collections with a timestamp index (if missing)"""
+    existing = set(db.list_collection_names())
+    for unit in ROLLUPS:
+        name = rollup_collection_name(unit)
+        if name not in existing:
+            db.create_collection(name)
+        db[name].create_index([(TIME_FIELD, 1)])
+
+
+def window_start(ts, seconds):
+    """Start of the window of the given length that ts falls in"""
+    epoch = datetime(1970, 1, 1)
+    return epoch + timedelta(
+        seconds=(ts - epoch) // timedelta(seconds=seconds) * seconds
+    )
+
+
+def reading_values():
+    """
+    Expression turning a raw document into [{k: field, v: {count, sum, min, max}}]
+
+    Long-format documents give their sensor_value, wide-format documents
+    every numeric field. Metadata and non-numeric values are left out.
+    """
+    skip = ["_id", TIME_FIELD, META_FIELD, "timestamp_readable", "topic", "sensor_name"]
+    converted = {
+        "$map": {
+            "input": {"$objectToArray": "$$ROOT"},
+            "in": {
+                "k": "$$this.k",
+                "v": {
+                    "$cond": [
+                        {"$in": [{"$type": "$$this.v"}, ROLLUP_VALUE_TYPES]},
+                        {
+                            "$convert": {
+                                "input": "$$this.v",
+                                "to": "double",
+                                "onError": None,
+                            }
+                        },
+                        None,
+                    ]
+                },
+            },
+        }
+    }
+    numeric = {
+        "$filter": {
+            "input": converted,
+            "cond": {
+                "$and": [
+                    {"$not": [{"$in": ["$$this.k", skip]}]},
+                    {"$eq": [{"$indexOfCP": ["$$this.k", "."]}, -1]},
+                    {"$ne": ["$$this.v", None]},
+                ]
+            },
+        }
+    }
+    return {
+        "$map": {
+            "input": numeric,
+            "in": {
+                "k": "$$this.k",
+                "v": {
+                    "count": {"$literal": 1},
+                    "sum": "$$this.v",
+                    "min": "$$this.v",
+                    "max": "$$this.v",
+                },
+            },
+        }
+    }
+
+
+def rollup_pipeline(team_name, unit, from_raw, since=None):
+    """
+    Aggregation that recomputes rollup windows and merges them into place
+
+    Args:
+        team_name: Team identifier (stored in META_FIELD)
+        unit: Rollup unit from ROLLUPS
+        from_raw: Source is COLLECTION_NAME (else the next finer rollup)
+        since: Only windows starting at or after this time (None = all)
+
+    Returns:
+        list: Aggregation pipeline stages
+    """
+    window = {"$dateTrunc": {"date": f"${TIME_FIELD}", "unit": unit}}
+    # Wide-format documents have no sensor_name; their windows have none either
+    sensor = "$sensor_name"
+    if from_raw:
+        count = {"$literal": 1}
+        values = reading_values()
+    else:
+        count = "$count"
+        values = {"$objectToArray": "$values"}
+
+    pipeline = []
+    if since is not None:
+        pipeline.append({"$match": {TIME_FIELD: {"$gte": since}}})
+
+    # The k: null entry carries the document count through the unwind
+    pipeline += [
+        {
+            "$project": {
+                "_id": 0,
+                "window": window,
+                "sensor": sensor,
+                "kv": {"$concatArrays": [[{"k": None, "v": {"count": count}}], values]},
+            }
+        },
+        {"$unwind": "$kv"},
+        {
+            "$group": {
+                "_id": {"t": "$window", "s": "$sensor", "k": "$kv.k"},
+                "count": {"$sum": "$kv.v.count"},
+                "sum": {"$sum": "$kv.v.sum"},
+                "min": {"$min": "$kv.v.min"},
+                "max": {"$max": "$kv.v.max"},
+            }
+        },
+        {
+            "$group": {
+                "_id": {"t": "$_id.t", "s": "$_id.s"},
+                "count": {"$sum": {"$cond": [{"$eq": ["$_id.k", None]}, "$count", 0]}},
+                "values": {
+                    "$push": {
+                        "k": "$_id.k",
+                        "v": {
+                            "count": "$count",
+                            "sum": "$sum",
+                            "min": "$min",
+                            "max": "$max",
+                        },
+                    }
+                },
+            }
+        },
+        {
+            "$project": {
+                TIME_FIELD: "$_id.t",
+                "sensor_name": "$_id.s",
+                META_FIELD: {"$literal": team_name},
+                "count": 1,
+                "values": {
+                    "$arrayToObject": {
+                        "$filter": {
+                            "input": "$values",
+                            "cond": {"$ne": ["$$this.k", None]},
+                        }
+                    }
+                },
+            }
+        },
+        {
+            "$merge": {
+                "into": rollup_collection_name(unit),
+                "on": "_id",
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }
+        },
+    ]
+    return pipeline
+
+
+def refresh_rollups(client, team_name):
+    """
+    Bring a team's rollup collections up to date
+
+    Only windows from the last refresh (minus ROLLUP_LATENESS_SECONDS)
+    onwards are recomputed; the first refresh builds everything.
+
+    Returns:
+        dict: Windows rewritten per rollup, or {"error": ...}
+    """
+    db_name = f"workshop_{team_name}"
+    result = {"name": db_name, "windows": {}}
+
+    try:
+        db = client[db_name]
+        create_rollup_collections(db)
+        state = db[ROLLUP_STATE_COLLECTION]
+
+        # Everything up to the newest reading now will be covered
+        newest = db[COLLECTION_NAME].find_one(
+            {}, {TIME_FIELD: 1}, sort=[(TIME_FIELD, -1)]
+        )
+        if newest is None:
+            return result
+
+        start = time.perf_counter()
+        source = None
+        for unit, seconds in ROLLUPS.items():
+            previous = state.find_one({"_id": unit})
+            since = None
+            if previous is not None:
+                since = window_start(
+                    previous["watermark"] - timedelta(seconds=ROLLUP_LATENESS_SECONDS),
+                    seconds,
+                )
+
+            collection = db[source or COLLECTION_NAME]
+            pipeline = rollup_pipeline(team_name, unit, source is None, since)
+            list(collection.aggregate(pipeline, allowDiskUse=True))
+
+            target = db[rollup_collection_name(unit)]
+            result["windows"][unit] = target.count_documents(
+                {TIME_FIELD: {"$gte": since}} if since else {}
+            )
+            state.update_one(
+                {"_id": unit},
+                {
+                    "$set": {
+                        "collection": rollup_collection_name(unit),
+                        "seconds": seconds,
+                        "lateness_seconds": ROLLUP_LATENESS_SECONDS,
+                        "watermark": newest[TIME_FIELD],
+                        "refreshed": datetime.utcnow(),
+                    }
+                },
+                upsert=True,
+            )
+            source = rollup_collection_name(unit)
+
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    except Exception as e:
+        return {"name": db_name, "error": str(e)}
+
+
+def print_rollup_results(results):
+    """Print a table of refreshed rollup windows per team"""
+    print(f"\n{'='*70}")
+    print("ROLLUP REFRESH")
+    print(f"{'='*70}")
+    columns = "".join(f"{unit.capitalize():>12}" for unit in ROLLUPS)
+    print(f"{'Database':<30}{columns}{'Time':>10}")
+    print("-" * 70)
+
+    for result in results:
+        if "error" in result:
+            print(f"✗ {result['name']:<28} {result['error']}")
+            continue
+        if not result["windows"]:
+            print(f"  {result['name']:<28} (no readings)")
+            continue
+        windows = "".join(f"{result['windows'][unit]:>12}" for unit in ROLLUPS)
+        print(f"  {result['name']:<28}{windows}{result['seconds']:>9.2f}s")
+
+    print("\n  Numbers are windows recomputed this run")
+
+
+def sha256_file(path):
+    """SHA-256 checksum of a file, read in 1 MB blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def count_bson_documents(data):
+    """Count the documents in a buffer of concatenated BSON documents"""
+    count = 0
+    offset = 0
+    while offset < len(data):
+        offset += int.from_bytes(data[offset : offset + 4], "little")
+        count += 1
+    return count
+
+
+def archive_collection(client, db_name, collection_name, folder):
+    """
+    Stream one collection into gzipped BSON chunk files
+
+    Documents arrive as raw BSON batches and are written without being
+    decoded. A new chunk file is started every ARCHIVE_CHUNK_DOCS documents.
+
+    Returns:
+        dict: Manifest entry (options, indexes, count, chunks with checksums),
+            or {"error": ...}
+    """
+    try:
+        db = client[db_name]
+        collection = db[collection_name]
+        info = list(db.list_collections(filter={"name": collection_name}))[0]
+        # Keep every index option (unique, expireAfterSeconds,
+        # partialFilterExpression, ...) so the restore recreates it as it was
+        indexes = []
+        for name, index in collection.index_information().items():
+            if name == "_id_":
+                continue
+            options = {
+                option: value
+                for option, value in index.items()
+                if option not in ["key", "v", "ns"]
+            }
+            indexes.append(
+                {
+                    "key": [list(key) for key in index["key"]],
+                    "name": name,
+                    "options": options,
+                }
+            )
+
+        os.makedirs(os.path.join(folder, db_name), exist_ok=True)
+        chunks = []
+        total = 0
+        f = None
+        chunk_docs = 0
+
+        def finish_chunk():
+            f.close()
+            path = os.path.join(folder, chunks[-1]["file"])
+            chunks[-1]["documents"] = chunk_docs
+            chunks[-1]["bytes"] = os.path.getsize(path)
+            chunks[-1]["sha256"] = sha256_file(path)
+
+        for raw_batch in collection.find_raw_batches({}).batch_size(
+            min(ARCHIVE_CHUNK_DOCS, 10_000)
+        ):
+            if f is None:
+                name = f"{db_name}/{collection_name}.{len(chunks):04d}.bson.gz"
+                chunks.append({"file": name})
+                f = gzip.open(os.path.join(folder, name), "wb", compresslevel=6)
+                chunk_docs = 0
+
+            f.write(raw_batch)
+            count = count_bson_documents(raw_batch)
+            chunk_docs += count
+            total += count
+
+            if chunk_docs >= ARCHIVE_CHUNK_DOCS:
+                finish_chunk()
+                f = None
+
+        if f is not None:
+            finish_chunk()
+
+        print(f"  ✓ Archived: {db_name}.{collection_name} ({total} documents)")
+        return {
+            "type": info.get("type", "collection"),
+            "options": info.get("options", {}),
+            "indexes": indexes,
+            "count": total,
+            "chunks": chunks,
+        }
+
+    except Exception as e:
+        print(f"  ✗ Error archiving {db_name}.{collection_name}: {e}")
+        return {"error": str(e)}
+
+
+def archive_databases(client, db_names, limiter):
+    """
+    Archive every collection of the given databases in parallel
+
+    Args:
+        client: MongoClient instance
+        db_names: Databases to archive
+        limiter: TokenBucket for the database operations
+
+    Returns:
+        str: Archive folder, or None if anything failed
+    """
+    folder = os.path.join(ARCHIVE_DIR, datetime.now().strftime("%Y%m%d_%H%M%S"))
+    suffix = 1
+    while os.path.exists(folder + (f"_{suffix}" if suffix > 1 else "")):
+        suffix += 1
+    if suffix > 1:
+        folder += f"_{suffix}"
+    os.makedirs(folder)
+
+    print(f"\n{'='*70}")
+    print("ARCHIVING DATABASES")
+    print(f"{'='*70}")
+    print(f"Folder: {folder}\n")
+
+    # One task per collection, so a big team doesn't hold up the others
+    tasks = []
+    for db_name in db_names:
+        for name in client[db_name].list_collection_names():
+            if not name.startswith("system."):
+                tasks.append((db_name, name))
+
+    def limited(task):
+        limiter.acquire()
+        return archive_collection(client, task[0], task[1], folder)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(ARCHIVE_WORKERS, len(tasks)))
+    ) as executor:
+        entries = list(executor.map(limited, tasks))
+
+    manifest = {"created": datetime.utcnow().isoformat() + "Z", "databases": {}}
+    failed = False
+    for (db_name, name), entry in zip(tasks, entries):
+        failed = failed or "error" in entry
+        manifest["databases"].setdefault(db_name, {})[name] = entry
+
+    # Extended JSON keeps dates, Int64 etc. in the options restorable
+    with open(os.path.join(folder, "manifest.json"), "w", encoding="utf-8") as f:
+        f.write(json_util.dumps(manifest, indent=2))
+
+    total = sum(entry.get("count", 0) for entry in entries)
+    seconds = time.perf_counter() - start
+    if failed:
+        print(f"\n✗ Archive incomplete - see errors above ({folder})")
+        return None
+
+    print(
+        f"\n✓ Archived {total} documents from {len(db_names)} databases in {seconds:.1f}s"
+    )
+    return folder
+
+
+def restore_chunk(client, db_name, collection_name, path):
+    """
+    Bulk-load one archive chunk with unordered insert_many batches
+
+    Returns:
+        tuple: (documents inserted, documents skipped as duplicates)
+    """
+    collection = client[db_name][collection_name]
+    inserted = 0
+    duplicates = 0
+
+    def insert(batch):
+        nonlocal inserted, duplicates
+        try:
+            inserted += len(collection.insert_many(batch, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            # Unordered: everything except the failed documents went in.
+            # Duplicate _id (code 11000) means the document is already there.
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            inserted += e.details.get("nInserted", 0)
+            duplicates += len(errors)
+
+    batch = []
+    with gzip.open(path, "rb") as f:
+        for doc in bson.decode_file_iter(f):
+            batch.append(doc)
+            if len(batch) >= RESTORE_BATCH_SIZE:
+                insert(batch)
+                batch = []
+    if batch:
+        insert(batch)
+
+    return inserted, duplicates
+
+
+def restore_archive(client, folder, limiter):
+    """
+    Restore every collection in an archive folder
+
+    All checksums are checked first. Collections are created with their
+    archived options (TimeSeries settings, expiry) if they don't exist,
+    then the chunk files are loaded on RESTORE_WORKERS threads and the
+    indexes recreated. Documents already present (same _id) are skipped;
+    TimeSeries collections that already hold data are left alone.
+
+    Returns:
+        bool: True if everything was restored
+    """
+    with open(os.path.join(folder, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json_util.loads(f.read())
+
+    print(f"\n{'='*70}")
+    print("RESTORING ARCHIVE")
+    print(f"{'='*70}")
+    print(f"Folder: {folder} (created {manifest['created']})")
+
+    # Check every chunk before touching the database
+    chunks = []
+    for db_name, collections in manifest["databases"].items():
+        for name, entry in collections.items():
+            if "error" in entry:
+                print(f"  ⚠ {db_name}.{name} was not archived completely - skipping")
+                continue
+            # TimeSeries collections don't reject a duplicate _id, so loading
+            # into one that already has data would double every reading
+            if entry["type"] == "timeseries" and client[db_name][name].find_one():
+                print(f"  ⚠ {db_name}.{name} already has data - skipping")
+                entry["error"] = "not empty"
+                continue
+            for chunk in entry["chunks"]:
+                chunks.append((db_name, name, chunk))
+
+    print(f"\nChecking {len(chunks)} chunk files...")
+    with ThreadPoolExecutor(max_workers=RESTORE_WORKERS) as executor:
+        checksums = list(
+            executor.map(
+                lambda item: sha256_file(os.path.join(folder, item[2]["file"])), chunks
+            )
+        )
+    bad = [
+        item[2]["file"]
+        for item, checksum in zip(chunks, checksums)
+        if checksum != item[2]["sha256"]
+    ]
+    if bad:
+        print(f"✗ Checksum mismatch: {', '.join(bad)}")
+        print("  Nothing was restored.")
+        return False
+    print("✓ All checksums match")
+
+    # Create missing collections with their original options
+    for db_name, collections in manifest["databases"].items():
+        db = client[db_name]
+        existing = set(db.list_collection_names())
+        for name, entry in collections.items():
+            if "error" in entry or name in existing:
+                continue
+            options = dict(entry["options"])
+            options.pop("uuid", None)
+            db.create_collection(name, **options)
+
+    def limited(item):
+        limiter.acquire()
+        db_name, name, chunk = item
+        return restore_chunk(client, db_name, name, os.path.join(folder, chunk["file"]))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(RESTORE_WORKERS, len(chunks)))
+    ) as executor:
+        results = list(executor.map(limited, chunks))
+
+    restored = {}
+    for (db_name, name, chunk), (inserted, duplicates) in zip(chunks, results):
+        totals = restored.setdefault((db_name, name), [0, 0])
+        totals[0] += inserted
+        totals[1] += duplicates
+
+    for db_name, collections in manifest["databases"].items():
+        for name, entry in collections.items():
+            if "error" in entry:
+                continue
+            for index in entry["indexes"]:
+                client[db_name][name].create_index(
+                    [tuple(key) for key in index["key"]],
+                    name=index["name"],
+                    **index.get("options", {}),
+                )
+
+            inserted, duplicates = restored.get((db_name, name), [0, 0])
+            line = (
+                f"  ✓ Restored: {db_name}.{name} ({inserted}/{entry['count']} documents"
+            )
+            if duplicates:
+                line += f", {duplicates} already there"
+            print(line + ")")
+
+    total = sum(inserted for inserted, _ in results)
+    print(f"\n✓ Restored {total} documents in {time.perf_counter() - start:.1f}s")
+    return True
+
+
 def print_summary(existing_dbs):
     """Print summary of existing databases"""
     print(f"\n{'='*70}")
@@ -176,7 +1083,7 @@ def print_summary(existing_dbs):
     total_size = 0
     total_docs = 0
 
-    print(f"\n{'Database':<30} {'Type':<15} {'Docs':<10} {'Size':<10}")
+    print(f"\n{'Database':<30} {'Type':<15} {'Docs':<10} {'Size':<10} {'Buckets':<10}")
     print("-" * 70)
 
     for db_info in existing_dbs:
@@ -186,16 +1093,30 @@ def print_summary(existing_dbs):
 
         db_type = "TimeSeries" if db_info["is_timeseries"] else "Regular"
         size_str = f"{db_info['size_mb']:.2f} MB"
+        docs_str = str(db_info["doc_count"])
+        if db_info["doc_count"] is None:
+            docs_str = "-"
+        elif not db_info["exact_count"]:
+            docs_str = "~" + docs_str
+        buckets_str = (
+            db_info["bucket_count"] if db_info["bucket_count"] is not None else "-"
+        )
 
         print(
-            f"{db_info['name']:<30} {db_type:<15} {db_info['doc_count']:<10} {size_str:<10}"
+            f"{db_info['name']:<30} {db_type:<15} {docs_str:<10} {size_str:<10} {buckets_str:<10}"
         )
 
         total_size += db_info["size_mb"]
-        total_docs += db_info["doc_count"]
+        total_docs += db_info["doc_count"] or 0
 
     print("-" * 70)
     print(f"{'TOTAL':<30} {'':<15} {total_docs:<10} {total_size:.2f} MB")
+    if not EXACT_COUNTS:
+        print("~ = count from collection metadata (set EXACT_COUNTS = True for exact)")
+        if not BUCKET_READING_COUNTS:
+            print(
+                "- = TimeSeries readings not counted (set BUCKET_READING_COUNTS = True)"
+            )
     print()
 
 
@@ -213,6 +1134,652 @@ def confirm_deletion():
     return response.strip() == "DELETE"
 
 
+def print_verification(client, limiter, success_count, failed_teams, action="created"):
+    """
+    Check every workshop database is a TimeSeries collection and print the summary
+
+    Args:
+        client: MongoClient instance
+        limiter: TokenBucket for the database operations
+        success_count: Teams set up without errors
+        failed_teams: Teams that failed
+        action: Word used in the summary ("created", "set up")
+    """
+    # Verify new databases
+    print(f"\n{'='*70}")
+    print("VERIFICATION")
+    print(f"{'='*70}")
+    print()
+
+    # Only the TEAMS databases (plan/apply mode may keep others)
+    team_db_names = {f"workshop_{team}" for team in TEAMS}
+    new_db_names = [
+        db_name
+        for db_name in list_existing_databases(client)
+        if db_name in team_db_names
+    ]
+    new_db_info = run_concurrently(
+        lambda db_name: get_database_info(client, db_name), new_db_names, limiter
+    )
+
+    verified_count = 0
+    print(f"{'Database':<30} {'Type':<15} {'Status':<10}")
+    print("-" * 70)
+
+    for info in new_db_info:
+        if "error" in info:
+            print(f"{info['name']:<30} ERROR           ✗ Failed")
+            continue
+
+        db_type = "TimeSeries" if info["is_timeseries"] else "Regular"
+        status = "✓ OK" if info["is_timeseries"] else "✗ Wrong type"
+
+        print(f"{info['name']:<30} {db_type:<15} {status:<10}")
+
+        if info["is_timeseries"]:
+            verified_count += 1
+
+    # Summary
+    print(f"\n{'='*70}")
+    print("SUMMARY")
+    print(f"{'='*70}")
+    print(f"Successfully {action}: {success_count}/{len(TEAMS)} databases")
+    print(f"Successfully verified: {verified_count}/{len(TEAMS)} databases")
+
+    if failed_teams:
+        print(f"\n⚠️  Failed teams: {', '.join(failed_teams)}")
+
+    if verified_count == len(TEAMS):
+        print("\n✅ All TimeSeries databases are ready!")
+        print("\nNext steps:")
+        print("  1. Update your MQTT bridge (ensure it uses new Date())")
+        print("  2. Restart the bridge")
+        print("  3. Test with: node test_mqtt_bridge.js")
+        print()
+        print("Bridge timestamp code should be:")
+        print("  data.timestamp = new Date();  // Date object, not string!")
+    else:
+        print("\n⚠️  Some databases need attention. Check errors above.")
+
+
+def get_collection_settings(client, db_name):
+    """
+    Read the sensor collection's type, options and index keys
+
+    Returns:
+        dict: listCollections entry (name, type, options) plus "indexes"
+            (list of key lists), or None if the collection doesn't exist
+    """
+    db = client[db_name]
+    infos = list(db.list_collections(filter={"name": COLLECTION_NAME}))
+    if not infos:
+        return None
+
+    info = infos[0]
+    info["indexes"] = []
+    if CREATE_INDEXES:
+        info["indexes"] = [
+            list(index["key"].items()) for index in db[COLLECTION_NAME].list_indexes()
+        ]
+    return info
+
+
+GRANULARITY_ORDER = ["seconds", "minutes", "hours"]
+
+
+def compare_settings(info, settings):
+    """
+    Compare an existing collection with the desired settings
+
+    Args:
+        info: Entry from get_collection_settings()
+        settings: Desired settings from team_settings()
+
+    Returns:
+        tuple: (action, reason, changes) - action is "ok", "create",
+            "modify" (changed in place) or "recreate" (drop and create);
+            changes holds the collMod options and missing indexes for "modify"
+    """
+    if info is None:
+        return "create", "no sensor collection", None
+    if info.get("type") != "timeseries":
+        return "recreate", "regular collection, not TimeSeries", None
+
+    options = info.get("options", {})
+    timeseries = options.get("timeseries", {})
+    if timeseries.get("timeField") != TIME_FIELD:
+        reason = f"timeField {timeseries.get('timeField')} → {TIME_FIELD}"
+        return "recreate", reason, None
+    if timeseries.get("metaField") != META_FIELD:
+        reason = f"metaField {timeseries.get('metaField')} → {META_FIELD}"
+        return "recreate", reason, None
+
+    reasons = []
+    coll_mod = {}
+
+    # Buckets can only be made longer in place, never shorter
+    current_span = timeseries.get("bucketMaxSpanSeconds")
+    granularity = timeseries.get("granularity")
+    span = settings["bucket_span_seconds"]
+    if span:
+        if granularity is not None or current_span != span:
+            reason = f"bucket span {current_span or granularity} → {span}s"
+            if current_span is not None and span < current_span:
+                return "recreate", reason, None
+            coll_mod["timeseries"] = {
+                "bucketMaxSpanSeconds": span,
+                "bucketRoundingSeconds": span,
+            }
+            reasons.append(reason)
+    elif granularity != settings["granularity"]:
+        current = granularity or f"{current_span}s"
+        reason = f"granularity {current} → {settings['granularity']}"
+        current_span = current_span or GRANULARITY_SPAN.get(granularity, 0)
+        if GRANULARITY_SPAN[settings["granularity"]] < current_span:
+            return "recreate", reason, None
+        coll_mod["timeseries"] = {"granularity": settings["granularity"]}
+        reasons.append(reason)
+
+    expire = settings["expire_after_seconds"]
+    if options.get("expireAfterSeconds") != expire:
+        coll_mod["expireAfterSeconds"] = expire if expire else "off"
+        reasons.append(f"expiry {options.get('expireAfterSeconds')} → {expire}")
+
+    missing_indexes = [
+        keys for keys in desired_indexes() if keys not in info.get("indexes", [])
+    ]
+    for keys in missing_indexes:
+        reasons.append(f"index {'+'.join(field for field, _ in keys)}")
+
+    if not reasons:
+        return "ok", "matches settings", None
+
+    changes = {"coll_mod": coll_mod, "indexes": missing_indexes}
+    return "modify", ", ".join(reasons), changes
+
+
+def build_plan(client, limiter):
+    """
+    Work out what has to change to reach the desired TEAMS and settings
+
+    Returns:
+        list: One dict per database (database, team, action, reason)
+    """
+    existing = set(list_existing_databases(client))
+    desired = {f"workshop_{team}": team for team in TEAMS}
+
+    # Only databases that exist need a look at their collection
+    to_check = [db_name for db_name in desired if db_name in existing]
+    settings = run_concurrently(
+        lambda db_name: get_collection_settings(client, db_name), to_check, limiter
+    )
+    found = dict(zip(to_check, settings))
+
+    plan = []
+    for db_name, team in desired.items():
+        if db_name in found:
+            action, reason, changes = compare_settings(
+                found[db_name], team_settings(team)
+            )
+        else:
+            action, reason, changes = "create", "new team", None
+        plan.append(
+            {
+                "database": db_name,
+                "team": team,
+                "action": action,
+                "reason": reason,
+                "changes": changes,
+            }
+        )
+
+    for db_name in sorted(existing - set(desired)):
+        action = "drop" if DROP_UNKNOWN_DATABASES else "keep"
+        plan.append(
+            {
+                "database": db_name,
+                "team": None,
+                "action": action,
+                "reason": "not in TEAMS",
+                "changes": None,
+            }
+        )
+
+    return plan
+
+
+def print_plan(plan):
+    """Print the reconcile plan"""
+    print(f"\n{'='*70}")
+    print("PLAN")
+    print(f"{'='*70}")
+    print(f"\n{'Database':<30} {'Action':<10} {'Reason'}")
+    print("-" * 70)
+
+    for entry in plan:
+        print(f"{entry['database']:<30} {entry['action']:<10} {entry['reason']}")
+
+    print("-" * 70)
+    counts = {}
+    for entry in plan:
+        counts[entry["action"]] = counts.get(entry["action"], 0) + 1
+    print(
+        ", ".join(
+            f"{counts.get(action, 0)} {action}"
+            for action in ["create", "modify", "recreate", "drop", "ok", "keep"]
+            if counts.get(action)
+        )
+    )
+
+
+def apply_change(client, entry):
+    """
+    Carry out one plan entry
+
+    Returns:
+        bool: True if successful
+    """
+    action = entry["action"]
+
+    if action == "create":
+        return create_timeseries_collection(client, entry["team"])
+
+    if action == "modify":
+        try:
+            db = client[entry["database"]]
+            if entry["changes"]["coll_mod"]:
+                db.command("collMod", COLLECTION_NAME, **entry["changes"]["coll_mod"])
+            for keys in entry["changes"]["indexes"]:
+                db[COLLECTION_NAME].create_index(keys)
+            print(f"  ✓ Updated: {entry['database']} ({entry['reason']})")
+            return True
+        except Exception as e:
+            print(f"  ✗ Error updating {entry['database']}: {e}")
+            return False
+
+    if action == "recreate":
+        return delete_database(client, entry["database"]) and (
+            create_timeseries_collection(client, entry["team"])
+        )
+
+    if action == "drop":
+        return delete_database(client, entry["database"])
+
+    return True
+
+
+def reconcile(client, limiter):
+    """Plan (and in "apply" mode make) only the changes that are needed"""
+    print("\nComparing databases with the settings...")
+    plan = build_plan(client, limiter)
+    print_plan(plan)
+
+    changes = [entry for entry in plan if entry["action"] not in ["ok", "keep"]]
+    if not changes:
+        print("\n✅ Everything matches the settings - nothing to change")
+        return
+
+    if SETUP_MODE == "plan":
+        print('\nSet SETUP_MODE = "apply" to make these changes.')
+        return
+
+    # Recreating or dropping deletes data, so ask first
+    if REQUIRE_CONFIRMATION and any(
+        entry["action"] in ["recreate", "drop"] for entry in changes
+    ):
+        if not confirm_deletion():
+            print("\n❌ Operation cancelled by user.")
+            return
+
+    to_delete = [
+        entry["database"]
+        for entry in changes
+        if entry["action"] in ["recreate", "drop"]
+    ]
+    if to_delete and ARCHIVE_BEFORE_DROP:
+        if archive_databases(client, to_delete, limiter) is None:
+            print("✗ Nothing was changed - fix the archive problem first")
+            return
+
+    print(f"\n{'='*70}")
+    print("APPLYING CHANGES")
+    print(f"{'='*70}")
+    print()
+
+    results = run_concurrently(
+        lambda entry: apply_change(client, entry), changes, limiter
+    )
+    failed = [entry for entry, ok in zip(changes, results) if not ok]
+    failed_teams = [entry["team"] or entry["database"] for entry in failed]
+    success_count = len(TEAMS) - len([entry for entry in failed if entry["team"]])
+
+    print_verification(client, limiter, success_count, failed_teams, action="set up")
+
+
+# Bucket spans "analyze" chooses from (seconds)
+BUCKET_SPAN_CHOICES = [60, 120, 300, 900, 1800, 3600, 7200, 21600, 43200, 86400]
+
+# Readings a bucket holds before MongoDB starts a new one
+BUCKET_MAX_COUNT = 1000
+
+
+def analyze_team(client, db_name):
+    """
+    Sample a team's newest readings and suggest bucket settings
+
+    The publish rate comes from the ANALYZE_SAMPLE_SIZE newest timestamps:
+    readings per timestamp over the median gap, so pauses (a board that
+    was switched off overnight) don't pull it down.
+    The suggested span is the longest choice in which one team's readings
+    still fit in a single bucket (BUCKET_MAX_COUNT), so buckets are full
+    when they close instead of many small ones.
+
+    Returns:
+        dict: Rate, current readings per bucket and suggested settings
+    """
+    try:
+        collection = client[db_name][COLLECTION_NAME]
+        docs = list(
+            collection.find({}, {TIME_FIELD: 1, "_id": 0})
+            .sort(TIME_FIELD, -1)
+            .limit(ANALYZE_SAMPLE_SIZE)
+        )
+        times = [
+            doc[TIME_FIELD] for doc in docs if isinstance(doc.get(TIME_FIELD), datetime)
+        ]
+
+        # Readings per bucket needs the bucket-header count
+        info = get_database_info(client, db_name, bucket_counts=True)
+        result = {
+            "name": db_name,
+            "team": db_name[len("workshop_") :],
+            "sample": len(times),
+            "rate": None,
+            "per_bucket": None,
+        }
+        if info.get("bucket_count") and info.get("doc_count") is not None:
+            result["per_bucket"] = info["doc_count"] / info["bucket_count"]
+
+        distinct = sorted(set(times))
+        gaps = sorted(
+            (newer - older).total_seconds()
+            for older, newer in zip(distinct, distinct[1:])
+        )
+        if not gaps:
+            return result
+
+        median_gap = gaps[len(gaps) // 2]
+        rate = len(times) / len(distinct) / median_gap
+        result["rate"] = rate
+
+        interval = 1 / rate
+        if interval < 60:
+            result["granularity"] = "seconds"
+        elif interval < 3600:
+            result["granularity"] = "minutes"
+        else:
+            result["granularity"] = "hours"
+
+        fits = [span for span in BUCKET_SPAN_CHOICES if span * rate <= BUCKET_MAX_COUNT]
+        result["bucket_span_seconds"] = fits[-1] if fits else BUCKET_SPAN_CHOICES[0]
+        return result
+
+    except Exception as e:
+        return {"name": db_name, "error": str(e)}
+
+
+def print_analysis(results):
+    """Print the analyze table and a TEAM_SETTINGS suggestion"""
+    print(f"\n{'='*70}")
+    print("ANALYSIS")
+    print(f"{'='*70}")
+    print(
+        f"\n{'Database':<26} {'Sample':>7} {'Readings/s':>11} {'Per bucket':>11} "
+        f"{'Granularity':>12}"
+    )
+    print("-" * 70)
+
+    suggestions = {}
+    for result in results:
+        if "error" in result:
+            print(f"{result['name']:<26} ERROR: {result['error']}")
+            continue
+
+        rate = f"{result['rate']:.3f}" if result["rate"] else "-"
+        per_bucket = f"{result['per_bucket']:.0f}" if result["per_bucket"] else "-"
+        granularity = result.get("granularity", "-")
+        print(
+            f"{result['name']:<26} {result['sample']:>7} {rate:>11} {per_bucket:>11} "
+            f"{granularity:>12}"
+        )
+
+        if result["rate"]:
+            suggestions[result["team"]] = {
+                "bucket_span_seconds": result["bucket_span_seconds"]
+            }
+
+    print("-" * 70)
+    print(
+        f"Per bucket = readings per bucket now (MongoDB fills up to {BUCKET_MAX_COUNT})"
+    )
+
+    if not suggestions:
+        print("\nNot enough data to suggest settings yet.")
+        return
+
+    print("\nSuggested settings (bucket span ≈ time for one bucket of readings):")
+    print("TEAM_SETTINGS = {")
+    for team, settings in suggestions.items():
+        print(f'    "{team}": {settings},')
+    print("}")
+    print('\nThen run SETUP_MODE = "plan" / "apply" to change the collections.')
+
+
+def poll_databases(client, limiter):
+    """
+    Take one monitor sample of every workshop database
+
+    Only $collStats metadata is read (no reading counts, see
+    BUCKET_READING_COUNTS), so a poll costs the same however big the
+    collections are.
+
+    Returns:
+        dict: {"time": epoch seconds, "databases": {name: sizes}}
+    """
+    names = list_existing_databases(client)
+    infos = run_concurrently(
+        lambda name: get_database_info(
+            client, name, exact_counts=False, bucket_counts=False
+        ),
+        names,
+        limiter,
+    )
+
+    sample = {"time": time.time(), "databases": {}}
+    for info in infos:
+        if "error" in info:
+            sample["databases"][info["name"]] = {"error": info["error"]}
+            continue
+        sample["databases"][info["name"]] = {
+            "docs": info["doc_count"],
+            "exact": info["exact_count"],
+            "data_mb": round(info["size_mb"], 3),
+            "storage_mb": round(info["storage_mb"], 3),
+            "index_mb": round(info["index_mb"], 3),
+            "buckets": info["bucket_count"],
+            "compression": (
+                round(info["compression"], 2) if info["compression"] else None
+            ),
+        }
+    return sample
+
+
+def used_mb(sample):
+    """Storage + index size of all databases in a sample"""
+    return sum(
+        db["storage_mb"] + db["index_mb"]
+        for db in sample["databases"].values()
+        if "error" not in db
+    )
+
+
+def format_duration(seconds):
+    """Seconds as a short human-readable duration"""
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min"
+    if seconds < 2 * 86400:
+        return f"{seconds / 3600:.1f} h"
+    return f"{seconds / 86400:.1f} days"
+
+
+def load_history(filename, window_seconds):
+    """Samples from the history file that are newer than window_seconds"""
+    if not os.path.exists(filename):
+        return []
+
+    since = time.time() - window_seconds
+    samples = []
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                sample = json.loads(line)
+            except ValueError:
+                continue  # Half-written line from an interrupted run
+            if sample["time"] >= since:
+                samples.append(sample)
+    return samples
+
+
+def print_sample(sample, previous, oldest):
+    """
+    Print one monitor sample
+
+    Args:
+        sample: Sample from poll_databases()
+        previous: The sample before it, for ingest rates (or None)
+        oldest: Oldest sample in the rate window, for the projection (or None)
+    """
+    # Ingest rate = data size growth in KB/s (samples from older history
+    # files have no data_mb and are skipped)
+    rates = {}
+    if previous is not None:
+        elapsed = sample["time"] - previous["time"]
+        for name, db in sample["databases"].items():
+            before = previous["databases"].get(name)
+            if elapsed > 0 and before and "error" not in db and "error" not in before:
+                if before.get("data_mb") is None:
+                    continue
+                growth_kb = (db["data_mb"] - before["data_mb"]) * 1024
+                rates[name] = max(0.0, growth_kb / elapsed)
+
+    active = sorted(rate for rate in rates.values() if rate > 0)
+    median = active[len(active) // 2] if active else 0
+
+    stamp = datetime.fromtimestamp(sample["time"]).strftime("%H:%M:%S")
+    print(f"\n{'='*86}")
+    print(f"CAPACITY {stamp}")
+    print(f"{'='*86}")
+    print(
+        f"{'Database':<28} {'Docs':>11} {'KB/s':>8} {'Storage MB':>11} "
+        f"{'Index MB':>9} {'Buckets':>9} {'Ratio':>6}"
+    )
+    print("-" * 86)
+
+    for name, db in sorted(sample["databases"].items()):
+        if "error" in db:
+            print(f"✗ {name:<26} {db['error']}")
+            continue
+
+        rate = rates.get(name)
+        rate_str = f"{rate:.1f}" if rate is not None else "-"
+        docs = "-" if db["docs"] is None else str(db["docs"])
+        if db["docs"] is not None and not db.get("exact"):
+            docs = "~" + docs
+        buckets = db["buckets"] if db["buckets"] is not None else "-"
+        ratio = f"{db['compression']:.1f}x" if db["compression"] else "-"
+        marker = ""
+        if rate and len(active) > 1 and rate > RUNAWAY_FACTOR * median:
+            marker = f"  ⚠ {rate / median:.0f}x median"
+
+        print(
+            f"{name:<28} {docs:>11} {rate_str:>8} "
+            f"{db['storage_mb']:>11.2f} {db['index_mb']:>9.2f} {buckets:>9} "
+            f"{ratio:>6}{marker}"
+        )
+
+    used = used_mb(sample)
+    print("-" * 86)
+    total_rate = f"{sum(rates.values()):.1f}" if rates else "-"
+    print(
+        f"{'TOTAL':<28} {'':>11} {total_rate:>8} {used:>11.2f} MB used (data + indexes)"
+    )
+
+    line = f"Budget {SIZE_BUDGET_MB} MB: {used / SIZE_BUDGET_MB:.0%} used"
+    if used >= SIZE_BUDGET_MB:
+        print(f"✗ {line} - over budget!")
+        return
+
+    growth = None
+    if oldest is not None and sample["time"] > oldest["time"]:
+        growth = (used - used_mb(oldest)) / (sample["time"] - oldest["time"])
+
+    if growth is None:
+        print(f"  {line}, growth known after the next poll")
+    elif growth <= 0:
+        print(f"✓ {line}, not growing")
+    else:
+        left = (SIZE_BUDGET_MB - used) / growth
+        marker = "⚠" if left < 7 * 86400 else "✓"
+        print(
+            f"{marker} {line}, growing {growth * 3600:.2f} MB/h "
+            f"→ full in ~{format_duration(left)}"
+        )
+
+
+def monitor(client, limiter):
+    """
+    Poll all workshop databases every MONITOR_INTERVAL_SECONDS
+
+    Each sample is appended to MONITOR_HISTORY_FILE. Ingest rates come from
+    the data size change since the previous sample, the budget projection
+    from the growth over MONITOR_RATE_WINDOW_SECONDS.
+    """
+    history = load_history(MONITOR_HISTORY_FILE, MONITOR_RATE_WINDOW_SECONDS)
+    print(f"\nMonitoring every {MONITOR_INTERVAL_SECONDS}s (Ctrl+C to stop)")
+    print(f"History: {MONITOR_HISTORY_FILE} ({len(history)} recent samples loaded)")
+
+    polls = 0
+    try:
+        while MONITOR_POLLS is None or polls < MONITOR_POLLS:
+            started = time.perf_counter()
+            sample = poll_databases(client, limiter)
+            poll_seconds = time.perf_counter() - started
+
+            with open(MONITOR_HISTORY_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(sample) + "\n")
+
+            # Drop samples that have left the rate window
+            cutoff = sample["time"] - MONITOR_RATE_WINDOW_SECONDS
+            history = [old for old in history if old["time"] >= cutoff]
+
+            print_sample(
+                sample,
+                history[-1] if history else None,
+                history[0] if history else None,
+            )
+            print(
+                f"  Poll took {poll_seconds:.2f}s for {len(sample['databases'])} databases"
+            )
+
+            history.append(sample)
+            polls += 1
+            if MONITOR_POLLS is not None and polls >= MONITOR_POLLS:
+                break
+            time.sleep(max(0.0, MONITOR_INTERVAL_SECONDS - poll_seconds))
+    except KeyboardInterrupt:
+        print("\n✓ Monitor stopped")
+
+
 def main():
     """Main function"""
     print("=" * 70)
@@ -220,6 +1787,7 @@ def main():
     print("=" * 70)
     print(f"Teams to configure: {len(TEAMS)}")
     print(f"Teams: {', '.join(TEAMS)}")
+    print(f"Mode: {SETUP_MODE}")
     print("=" * 70)
     print()
 
@@ -227,6 +1795,11 @@ def main():
     if "YOUR_PASSWORD" in MONGODB_ADMIN_URI or "xxxxx" in MONGODB_ADMIN_URI:
         print("✗ ERROR: Please update MONGODB_ADMIN_URI with your actual credentials!")
         sys.exit(1)
+    try:
+        limiter = TokenBucket(OPERATIONS_PER_SECOND, RATE_BURST)
+    except ValueError as e:
+        print(f"✗ ERROR: OPERATIONS_PER_SECOND: {e}")
+        sys.exit(1)
 
     # Connect to MongoDB
     print("Connecting to MongoDB Atlas...")
@@ -239,19 +1812,77 @@ def main():
         server_info = client.server_info()
         version = server_info.get("version", "unknown")
         print(f"  MongoDB version: {version}")
+        print(
+            f"  Workers: {SETUP_WORKERS}, rate limit: {OPERATIONS_PER_SECOND or 'none'} ops/s"
+        )
 
         version_parts = version.split(".")
         major_version = int(version_parts[0]) if version_parts else 0
+        minor_version = int(version_parts[1]) if len(version_parts) > 1 else 0
 
         if major_version < 5:
             print(f"\n⚠  WARNING: TimeSeries requires MongoDB 5.0+")
             print(f"   Your version: {version}")
             sys.exit(1)
 
+        # Check before creating anything, so no team is left half set up
+        creates_collections = SETUP_MODE in ["reset", "plan", "apply"] and not (
+            "--restore" in sys.argv or "--refresh-rollups" in sys.argv
+        )
+        needed, feature = required_version()
+        if creates_collections and (major_version, minor_version) < needed:
+            print(f"\n⚠  WARNING: {feature} requires MongoDB {needed[0]}.{needed[1]}+")
+            print(f"   Your version: {version}")
+            print("   Change the collection settings at the top of this file")
+            sys.exit(1)
+
     except Exception as e:
         print(f"✗ Connection failed: {e}")
         sys.exit(1)
 
+    if "--restore" in sys.argv:
+        position = sys.argv.index("--restore") + 1
+        if position >= len(sys.argv):
+            print("✗ Usage: python database_setup.py --restore <archive folder>")
+            sys.exit(1)
+        ok = restore_archive(client, sys.argv[position], limiter)
+        client.close()
+        print("\n✓ Connection closed")
+        sys.exit(0 if ok else 1)
+
+    if "--refresh-rollups" in sys.argv:
+        results = run_concurrently(
+            lambda team: refresh_rollups(client, team), TEAMS, limiter
+        )
+        print_rollup_results(results)
+        client.close()
+        print("\n✓ Connection closed")
+        sys.exit(1 if any("error" in result for result in results) else 0)
+
+    if SETUP_MODE == "monitor":
+        monitor(client, limiter)
+        client.close()
+        print("\n✓ Connection closed")
+        return
+
+    if SETUP_MODE == "analyze":
+        print("\nSampling team data...")
+        results = run_concurrently(
+            lambda db_name: analyze_team(client, db_name),
+            list_existing_databases(client),
+            limiter,
+        )
+        print_analysis(results)
+        client.close()
+        print("\n✓ Connection closed")
+        return
+
+    if SETUP_MODE in ["plan", "apply"]:
+        reconcile(client, limiter)
+        client.close()
+        print("\n✓ Connection closed")
+        return
+
     # List existing databases
     print("\nScanning for existing workshop databases...")
     existing_db_names = list_existing_databases(client)
@@ -263,11 +1894,12 @@ def main():
         print(f"Found {len(existing_db_names)} existing workshop databases.")
 
         # Get detailed info about each database
-        existing_db_info = []
-        for db_name in existing_db_names:
-            print(f"  Analyzing {db_name}...", end="\r")
-            info = get_database_info(client, db_name)
-            existing_db_info.append(info)
+        print(f"  Analyzing {len(existing_db_names)} databases...", end="\r")
+        existing_db_info = run_concurrently(
+            lambda db_name: get_database_info(client, db_name),
+            existing_db_names,
+            limiter,
+        )
 
         print(" " * 50, end="\r")  # Clear the line
 
@@ -281,16 +1913,25 @@ def main():
                 client.close()
                 sys.exit(0)
 
+        if ARCHIVE_BEFORE_DROP:
+            if archive_databases(client, existing_db_names, limiter) is None:
+                print("✗ Nothing was deleted - fix the archive problem first")
+                print("  (or set ARCHIVE_BEFORE_DROP = False)")
+                client.close()
+                sys.exit(1)
+
         # Delete existing databases
         print(f"\n{'='*70}")
         print("DELETING EXISTING DATABASES")
         print(f"{'='*70}")
 
-        delete_count = 0
-        for db_name in existing_db_names:
-            if delete_database(client, db_name):
-                delete_count += 1
-            time.sleep(0.1)  # Small delay to avoid overwhelming MongoDB
+        # The rate limiter keeps MongoDB from being overwhelmed
+        deleted = run_concurrently(
+            lambda db_name: delete_database(client, db_name),
+            existing_db_names,
+            limiter,
+        )
+        delete_count = sum(deleted)
 
         print(f"\n✓ Deleted {delete_count}/{len(existing_db_names)} databases")
 
@@ -300,67 +1941,13 @@ def main():
     print(f"{'='*70}")
     print()
 
-    success_count = 0
-    failed_teams = []
-
-    for team in TEAMS:
-        if create_timeseries_collection(client, team):
-            success_count += 1
-        else:
-            failed_teams.append(team)
-        time.sleep(0.1)  # Small delay between creations
-
-    # Verify new databases
-    print(f"\n{'='*70}")
-    print("VERIFICATION")
-    print(f"{'='*70}")
-    print()
+    created = run_concurrently(
+        lambda team: create_timeseries_collection(client, team), TEAMS, limiter
+    )
+    success_count = sum(created)
+    failed_teams = [team for team, ok in zip(TEAMS, created) if not ok]
 
-    new_db_names = list_existing_databases(client)
-    new_db_info = []
-
-    for db_name in new_db_names:
-        info = get_database_info(client, db_name)
-        new_db_info.append(info)
-
-    verified_count = 0
-    print(f"{'Database':<30} {'Type':<15} {'Status':<10}")
-    print("-" * 70)
-
-    for info in new_db_info:
-        if "error" in info:
-            print(f"{info['name']:<30} ERROR           ✗ Failed")
-            continue
-
-        db_type = "TimeSeries" if info["is_timeseries"] else "Regular"
-        status = "✓ OK" if info["is_timeseries"] else "✗ Wrong type"
-
-        print(f"{info['name']:<30} {db_type:<15} {status:<10}")
-
-        if info["is_timeseries"]:
-            verified_count += 1
-
-    # Summary
-    print(f"\n{'='*70}")
-    print("SUMMARY")
-    print(f"{'='*70}")
-    print(f"Successfully created: {success_count}/{len(TEAMS)} databases")
-    print(f"Successfully verified: {verified_count}/{len(TEAMS)} databases")
-
-    if failed_teams:
-        print(f"\n⚠️  Failed teams: {', '.join(failed_teams)}")
-
-    if verified_count == len(TEAMS):
-        print("\n✅ All TimeSeries databases are ready!")
-        print("\nNext steps:")
-        print("  1. Update your MQTT bridge (ensure it uses new Date())")
-        print("  2. Restart the bridge")
-        print("  3. Test with: node test_mqtt_bridge.js")
-        print()
-        print("Bridge timestamp code should be:")
-        print("  data.timestamp = new Date();  // Date object, not string!")
-    else:
-        print("\n⚠️  Some databases need attention. Check errors above.")
+    print_verification(client, limiter, success_count, failed_teams)
 
     # Close connection
     client.close()
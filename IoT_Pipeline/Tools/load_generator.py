@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Ingest Load Generator
+Writes bridge-shaped sensor documents for many teams at a fixed rate and
+compares TimeSeries with regular collections and single with bulk inserts
+"""
+
+from pymongo import MongoClient
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+
+from database_setup import (
+    COLLECTION_NAME,
+    META_FIELD,
+    TEAMS,
+    TIME_FIELD,
+    desired_indexes,
+    get_database_info,
+    team_settings,
+    timeseries_options,
+)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Local MongoDB to load (never point this at the workshop cluster!)
+LOAD_URI = "mongodb://localhost:27017"
+
+# Databases are named LOAD_DATABASE_PREFIX + team and dropped before each case
+LOAD_DATABASE_PREFIX = "loadtest_"
+
+# Number of teams writing at the same time. Each value is one run, so a
+# list finds the point where writes start backing up:
+#   TEAM_COUNTS = [10, 50, 100, 200]
+# Teams beyond len(TEAMS) get generated names (load011, load012, ...)
+TEAM_COUNTS = [len(TEAMS)]
+
+# Messages per second per team (the ESP32 sketch publishes every 500 ms)
+# None = as fast as each team can write
+MESSAGES_PER_SECOND = 2
+
+# How long each case writes for
+DURATION_SECONDS = 30
+
+# What to compare:
+#   "timeseries" / "regular" - collection type (TimeSeries uses database_setup's settings)
+#   "single" / "bulk"        - insert_one per message like the bridge, or insert_many
+COLLECTION_TYPES = ["timeseries", "regular"]
+INSERT_MODES = ["single", "bulk"]
+
+# Bulk mode: write when BATCH_SIZE messages are waiting or after BULK_FLUSH_SECONDS
+BATCH_SIZE = 100
+BULK_FLUSH_SECONDS = 1.0
+
+# A team more than this many seconds behind its schedule at the end is backed up
+BACKLOG_LIMIT_SECONDS = 1.0
+
+# Folder for the result files (load_YYYYmmdd_HHMMSS.json)
+RESULTS_DIR = "load_results"
+
+# ============================================================================
+# DOCUMENTS
+# ============================================================================
+
+SENSORS = ["dht_sensor", "light_sensor", "accelerometer"]
+
+
+def timestamp_readable(ts):
+    """Same format as timeConverter() in the MQTT bridge"""
+    return f"{ts.day} {ts.strftime('%b %Y %H:%M:%S')}"
+
+
+def make_document(team, sequence, rng):
+    """
+    One message as the bridge stores it
+
+    Args:
+        team: Team name
+        sequence: Message number, picks the sensor
+        rng: random.Random for the reading
+
+    Returns:
+        dict: Sensor document
+    """
+    ts = datetime.utcnow()
+    return {
+        "sensor_name": SENSORS[sequence % len(SENSORS)],
+        # The ESP32 sketch sends its readings as strings
+        "sensor_value": f"{rng.uniform(15, 30):.2f}",
+        TIME_FIELD: ts,
+        "timestamp_readable": timestamp_readable(ts),
+        "topic": team,
+        META_FIELD: team,
+    }
+
+
+def load_teams(count):
+    """The first count teams from TEAMS, topped up with generated names"""
+    teams = TEAMS[:count]
+    for i in range(len(teams), count):
+        teams.append(f"load{i + 1:03d}")
+    return teams
+
+
+def prepare_collection(client, team, collection_type):
+    """Drop and create one team's collection with database_setup's indexes"""
+    db = client[LOAD_DATABASE_PREFIX + team]
+    db.drop_collection(COLLECTION_NAME)
+
+    if collection_type == "timeseries":
+        db.create_collection(
+            COLLECTION_NAME, timeseries=timeseries_options(team_settings(team))
+        )
+    else:
+        db.create_collection(COLLECTION_NAME)
+
+    collection = db[COLLECTION_NAME]
+    for keys in desired_indexes():
+        collection.create_index(keys)
+    return collection
+
+
+# ============================================================================
+# MEASUREMENT
+# ============================================================================
+
+
+def write(collection, team, mode, sequence, count, rng):
+    """Insert count new messages, returning how long the insert took"""
+    docs = [make_document(team, sequence + i, rng) for i in range(count)]
+
+    begin = time.perf_counter()
+    if mode == "single":
+        collection.insert_one(docs[0])
+    else:
+        collection.insert_many(docs, ordered=False)
+    return time.perf_counter() - begin
+
+
+def run_team(collection, team, mode, duration):
+    """
+    Write one team's messages on schedule until duration runs out
+
+    Message n is due at start + n / MESSAGES_PER_SECOND. When the writes
+    can't keep up, messages pile up and the lag (how late the oldest
+    unwritten message is) grows.
+
+    Returns:
+        dict: Documents written, latency of every insert call, lag
+    """
+    rng = random.Random(team)
+    interval = 1 / MESSAGES_PER_SECOND if MESSAGES_PER_SECOND else 0
+    start = time.perf_counter()
+    deadline = start + duration
+    last_flush = start
+    sent = 0
+    latencies = []
+    max_lag = 0.0
+
+    while True:
+        now = time.perf_counter()
+        if now >= deadline:
+            break
+
+        if interval:
+            pending = int((now - start) / interval) + 1 - sent
+        else:
+            pending = BATCH_SIZE if mode == "bulk" else 1
+
+        if pending <= 0:
+            time.sleep(max(0.0, min(start + sent * interval, deadline) - now))
+            continue
+
+        if mode == "bulk" and pending < BATCH_SIZE:
+            # Wait for a full batch or the flush interval, whichever is first
+            wake = min(
+                start + (sent + BATCH_SIZE - 1) * interval,
+                last_flush + BULK_FLUSH_SECONDS,
+            )
+            if now < wake:
+                time.sleep(max(0.0, min(wake, deadline) - now))
+                continue
+
+        max_lag = max(max_lag, now - (start + sent * interval)) if interval else 0.0
+
+        count = 1 if mode == "single" else min(pending, BATCH_SIZE)
+        latencies.append(write(collection, team, mode, sent, count, rng))
+        last_flush = time.perf_counter()
+        sent += count
+
+    # How late the oldest message still waiting is when time runs out
+    final_lag = max(0.0, deadline - (start + sent * interval)) if interval else 0.0
+
+    # Write the last batch bulk mode was still holding back
+    if mode == "bulk" and interval:
+        count = min(math.ceil(duration / interval) - sent, BATCH_SIZE)
+        if count > 0:
+            latencies.append(write(collection, team, mode, sent, count, rng))
+            sent += count
+    return {
+        "documents": sent,
+        "latencies": latencies,
+        "max_lag": max_lag,
+        "final_lag": final_lag,
+    }
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def storage_stats(client, teams):
+    """Sum documents, storage and buckets over the load databases"""
+    # Flush to disk so storageSize includes everything just written
+    client.admin.command("fsync")
+
+    totals = {"documents": 0, "storage_bytes": 0, "bucket_count": None}
+    for team in teams:
+        info = get_database_info(client, LOAD_DATABASE_PREFIX + team, exact_counts=True)
+        if "error" in info:
+            print(f"  ⚠ No statistics for {info['name']}: {info['error']}")
+            continue
+        totals["documents"] += info["doc_count"]
+        totals["storage_bytes"] += info["storage_mb"] * 1024 * 1024
+        buckets = info["bucket_count"]
+        if buckets is not None:
+            totals["bucket_count"] = (totals["bucket_count"] or 0) + buckets
+    return totals
+
+
+def run_case(client, teams, collection_type, mode):
+    """
+    Run one case: every team writes for DURATION_SECONDS at the same time
+
+    Returns:
+        dict: Throughput, latency percentiles, lag and storage figures
+    """
+    collections = [prepare_collection(client, team, collection_type) for team in teams]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(teams)) as executor:
+        results = list(
+            executor.map(
+                lambda args: run_team(*args, mode, DURATION_SECONDS),
+                zip(collections, teams),
+            )
+        )
+    seconds = time.perf_counter() - start
+
+    latencies = sorted(value for result in results for value in result["latencies"])
+    written = sum(result["documents"] for result in results)
+    # Bulk mode holds messages back for up to BULK_FLUSH_SECONDS on purpose
+    limit = BACKLOG_LIMIT_SECONDS + (BULK_FLUSH_SECONDS if mode == "bulk" else 0)
+    backed_up = [
+        team for team, result in zip(teams, results) if result["final_lag"] > limit
+    ]
+    storage = storage_stats(client, teams)
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        "teams": len(teams),
+        "collection_type": collection_type,
+        "mode": mode,
+        "seconds": round(seconds, 2),
+        "documents": written,
+        "docs_per_sec": round(written / seconds) if seconds else None,
+        "target_docs_per_sec": (
+            MESSAGES_PER_SECOND * len(teams) if MESSAGES_PER_SECOND else None
+        ),
+        "insert_calls": len(latencies),
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 0.50)),
+            "p95": ms(percentile(latencies, 0.95)),
+            "p99": ms(percentile(latencies, 0.99)),
+            "max": ms(latencies[-1] if latencies else None),
+        },
+        "max_lag_seconds": round(max(result["max_lag"] for result in results), 3),
+        "backed_up_teams": backed_up,
+        "stored_documents": storage["documents"],
+        "storage_bytes": int(storage["storage_bytes"]),
+        "bytes_per_doc": (
+            round(storage["storage_bytes"] / storage["documents"], 1)
+            if storage["documents"]
+            else None
+        ),
+        "bucket_count": storage["bucket_count"],
+    }
+
+
+def print_results(runs):
+    """Print a results table"""
+    print(f"\n{'='*96}")
+    print("RESULTS")
+    print(f"{'='*96}")
+    print(
+        f"{'Teams':>5} {'Collection':<11} {'Mode':<7} {'Docs/s':>8} {'p50 ms':>7} "
+        f"{'p95 ms':>7} {'p99 ms':>7} {'Max lag':>8} {'Buckets':>8} {'B/doc':>7}  Status"
+    )
+    print("-" * 96)
+
+    for run in runs:
+        latency = run["latency_ms"]
+
+        def value(number, width):
+            return f"{number:>{width}}" if number is not None else f"{'-':>{width}}"
+
+        if run["backed_up_teams"]:
+            status = f"⚠ {len(run['backed_up_teams'])} teams backed up"
+        else:
+            status = "✓ kept up"
+        print(
+            f"{run['teams']:>5} {run['collection_type']:<11} {run['mode']:<7} "
+            f"{run['docs_per_sec'] or 0:>8} {value(latency['p50'], 7)} "
+            f"{value(latency['p95'], 7)} {value(latency['p99'], 7)} "
+            f"{run['max_lag_seconds']:>7.2f}s {value(run['bucket_count'], 8)} "
+            f"{value(run['bytes_per_doc'], 7)}  {status}"
+        )
+
+
+def main():
+    """Main load generator function"""
+    print("=" * 96)
+    print("Ingest Load Generator")
+    print("=" * 96)
+    print(f"Server: {LOAD_URI}")
+    print(f"Team counts: {', '.join(str(count) for count in TEAM_COUNTS)}")
+    rate = (
+        f"{MESSAGES_PER_SECOND} msg/s" if MESSAGES_PER_SECOND else "as fast as possible"
+    )
+    print(f"Rate per team: {rate}, {DURATION_SECONDS}s per case")
+
+    client = MongoClient(
+        LOAD_URI,
+        serverSelectionTimeoutMS=5000,
+        maxPoolSize=max(100, max(TEAM_COUNTS)),
+    )
+    client.admin.command("ping")
+    print("✓ Connected")
+
+    runs = []
+    try:
+        for count in TEAM_COUNTS:
+            teams = load_teams(count)
+            for collection_type in COLLECTION_TYPES:
+                for mode in INSERT_MODES:
+                    print(
+                        f"  Running {count} teams, {collection_type}, {mode} inserts..."
+                    )
+                    runs.append(run_case(client, teams, collection_type, mode))
+    finally:
+        # Leave the server as it was
+        for name in client.list_database_names():
+            if name.startswith(LOAD_DATABASE_PREFIX):
+                client.drop_database(name)
+        client.close()
+
+    print_results(runs)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    filename = os.path.join(
+        RESULTS_DIR, f"load_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    results = {
+        "created": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "server": LOAD_URI,
+        "messages_per_second": MESSAGES_PER_SECOND,
+        "duration_seconds": DURATION_SECONDS,
+        "batch_size": BATCH_SIZE,
+        "runs": runs,
+    }
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✓ Results saved to {filename}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠ Load test cancelled by user")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n✗ Unexpected error: {e}")
+        import traceback
+
+        traceback.print_exc()
+        sys.exit(1)